@@ -0,0 +1,128 @@
+#!/usr/bin/python
+
+###############################################################################
+#
+# This script is released under the GPL v2 license
+#
+###############################################################################
+
+"""
+A cache of the EXIF tags read by gpicsync.
+
+The Date/Time Original, size and GPS position of the pictures (see
+geoexif.readPicturesInfo) are kept in an SQLite database (CACHE_FILE)
+shared by the sync, the EXIF reader, the rename tool and geonames, so the
+pictures which didn't change since they were read aren't read again:
+
+    cache=ExifCache()
+    infos=cache.get(pictures) # the pictures found in the cache
+    ...
+    cache.put(newInfos)
+
+A picture is found only if its size, modification time and ctime are the
+ones it had when read. On unix ctime is the change time, updated by any
+write even when the modification time is set back (like exiftool -P
+does), but on Windows it is the creation time: a picture rewritten there
+by another program with the same size and modification time isn't
+noticed. So every write of gpicsync (GeoExif, GpsWriter) and the rename
+tool remove the pictures from the cache (see geoexif.forgetPictures), and
+the cache of pictures edited with other tools can be cleared by deleting
+CACHE_FILE.
+"""
+
+import os,sqlite3,threading
+import json
+
+CACHE_FILE=os.path.join(os.path.expanduser("~"),".gpicsync","exif.db")
+
+SCHEMA="""
+CREATE TABLE IF NOT EXISTS pictures (path TEXT PRIMARY KEY,size INTEGER,
+mtime REAL,ctime REAL,info TEXT);
+"""
+
+def fileKey(picture):
+    """
+    Returns (path,size,mtime,ctime) identifying the current version of a
+    picture, or None if it can't be read.
+    """
+    path=os.path.abspath(picture)
+    if isinstance(path,unicode):
+        path=path.encode("utf-8")
+    try:
+        stat=os.stat(picture)
+    except OSError:
+        return None
+    return path,stat.st_size,stat.st_mtime,stat.st_ctime
+
+def decodeInfo(data):
+    """Returns the info of a picture saved in the cache"""
+    info=json.loads(data)
+    # byte strings like the values read with exiftool
+    info["dateTimeSize"]=[isinstance(value,unicode) and value.encode("utf-8") or value
+    for value in info["dateTimeSize"]]
+    return dict([(str(key),value) for key,value in info.items()])
+
+class ExifCache(object):
+    """
+    The tags of the pictures read before (see the module documentation).
+    An ExifCache can be used by several threads.
+    """
+    def __init__(self,fileName=CACHE_FILE):
+        """Opens (or creates) the cache in the SQLite database fileName"""
+        directory=os.path.dirname(fileName)
+        if directory and not os.path.isdir(directory): os.makedirs(directory)
+        self.lock=threading.Lock()
+        self.db=sqlite3.connect(fileName,check_same_thread=False)
+        self.db.text_factory=str # the paths are byte strings
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def get(self,pictures):
+        """
+        Returns a dictionary picture -> info (like readPicturesInfo) of the
+        pictures found in the cache and unchanged since.
+        """
+        infos={}
+        self.lock.acquire()
+        try:
+            for picture in pictures:
+                key=fileKey(picture)
+                if key is None: continue
+                row=self.db.execute("SELECT size,mtime,ctime,info FROM pictures WHERE path=?",
+                (key[0],)).fetchone()
+                if row is not None and tuple(row[0:3])==key[1:4]:
+                    infos[picture]=decodeInfo(row[3])
+        finally:
+            self.lock.release()
+        return infos
+
+    def put(self,infos):
+        """Saves the infos of pictures, a dictionary picture -> info"""
+        rows=[]
+        for picture,info in infos.items():
+            key=fileKey(picture)
+            if key is not None:
+                rows.append(key+(json.dumps(info),))
+        self.lock.acquire()
+        try:
+            self.db.executemany("INSERT OR REPLACE INTO pictures VALUES (?,?,?,?,?)",rows)
+            self.db.commit()
+        finally:
+            self.lock.release()
+
+    def forget(self,pictures):
+        """Removes pictures from the cache (after writing in them)"""
+        paths=[]
+        for picture in pictures:
+            path=os.path.abspath(picture)
+            if isinstance(path,unicode):
+                path=path.encode("utf-8")
+            paths.append((path,))
+        self.lock.acquire()
+        try:
+            self.db.executemany("DELETE FROM pictures WHERE path=?",paths)
+            self.db.commit()
+        finally:
+            self.lock.release()
@@ -0,0 +1,441 @@
+#!/usr/bin/python
+
+###############################################################################
+#
+# This script is released under the GPL v2 license
+#
+###############################################################################
+
+"""
+A reader for the few EXIF tags gpicsync needs, without running exiftool.
+
+The tags are read from the TIFF structure stored in the APP1 segment of
+JPEG files, or at the start of the TIFF based RAW files (CR2, NEF, DNG,
+PEF, ORF...). Only the headers are read: the JPEG segments are skipped
+with seeks up to the image data, and the IFDs are read entry by entry.
+
+    info=readExifHeader("picture.jpg")
+    info["DateTimeOriginal"] # '2007:02:12 16:09:10' or None
+
+ExifHeaderError is raised for the files which can't be read this way, the
+callers then use exiftool (see GeoExif.readDateTimeSize).
+
+writeJpegGps writes a GPS position in the EXIF header of a JPEG file. The
+values of the GPS tags are replaced in place when the file already has
+them, otherwise a new GPS IFD is added at the end of the EXIF segment and
+the file is rewritten in a temporary file renamed over the picture. When
+a backup is asked, the original file is renamed to the backup name
+instead of being copied, so the picture is written only once.
+"""
+
+import os,sys,struct,re,shutil,tempfile
+
+# TIFF tags read: number -> name
+SUBIFDS_TAG=0x014a
+IFD0_TAGS={0x00fe:"NewSubfileType",0x0100:"ImageWidth",0x0101:"ImageHeight",SUBIFDS_TAG:"SubIFDs",
+0x8769:"ExifIFD",0x8825:"GPSIFD"}
+SUBIFD_TAGS={0x00fe:"NewSubfileType",0x0100:"ImageWidth",0x0101:"ImageHeight"}
+MAX_SUBIFDS=10
+EXIF_TAGS={0x9003:"DateTimeOriginal",0xa002:"ExifImageWidth",0xa003:"ExifImageHeight"}
+GPS_TAGS={1:"GPSLatitudeRef",2:"GPSLatitude",3:"GPSLongitudeRef",4:"GPSLongitude",
+5:"GPSAltitudeRef",6:"GPSAltitude"}
+# TIFF types: number -> (size of a value, struct format)
+TIFF_TYPES={1:(1,"B"),2:(1,"s"),3:(2,"H"),4:(4,"I"),5:(8,"II"),6:(1,"b"),7:(1,"s"),
+8:(2,"h"),9:(4,"i"),10:(8,"ii"),13:(4,"I")}
+BYTE,ASCII,LONG,RATIONAL=1,2,4,5
+IFD_TYPES=(LONG,13) # the types of the pointers to an IFD
+GPS_IFD_TAG=0x8825
+POINTER_TAGS=(0x8769,GPS_IFD_TAG)
+GPS_VERSION="\x02\x02\x00\x00" # GPSVersionID 2.2.0.0, written with a new GPS IFD
+MAX_SEGMENT=65535 # maximum size of a JPEG segment (with its length)
+# JPEG markers with the size of the image (SOF0 to SOF15 but DHT, JPG and DAC)
+SOF_MARKERS=[marker for marker in range(0xC0,0xD0) if marker not in (0xC4,0xC8,0xCC)]
+MAX_ENTRIES=1000 # more entries in an IFD means a corrupted file
+DATE_TIME=re.compile(r"\d{4}:\d\d:\d\d \d\d:\d\d:\d\d")
+
+class ExifHeaderError(Exception):
+    """Raised when the EXIF tags of a file can't be read without exiftool"""
+    pass
+
+def readBytes(f,size):
+    """Read exactly size bytes from f"""
+    data=f.read(size)
+    if len(data)!=size:
+        raise ExifHeaderError("Unexpected end of file")
+    return data
+
+class TiffReader(object):
+    """
+    Reads the IFDs of a TIFF structure starting at 'base' in a file and
+    ending at 'end' (the end of the file by default): the offsets and
+    counts read are checked against it before reading anything.
+    """
+    def __init__(self,f,base=0,end=None):
+        self.f=f
+        self.base=base
+        if end is None:
+            end=os.fstat(f.fileno()).st_size
+        self.end=end
+        if base+8>end:
+            raise ExifHeaderError("Not a TIFF header")
+        header=readBytes(f,8)
+        if header[0:2]=="II": self.endian="<"
+        elif header[0:2]=="MM": self.endian=">"
+        else: raise ExifHeaderError("Not a TIFF header")
+        # 42 for TIFF, 'RO' and 'RS' for the Olympus ORF files
+        magic=struct.unpack(self.endian+"H",header[2:4])[0]
+        if magic not in (42,0x4f52,0x5352):
+            raise ExifHeaderError("Not a TIFF header")
+        self.first=struct.unpack(self.endian+"I",header[4:8])[0]
+
+    def read(self,offset,size):
+        if offset<0 or self.base+offset+size>self.end:
+            raise ExifHeaderError("EXIF data out of the file")
+        self.f.seek(self.base+offset)
+        return readBytes(self.f,size)
+
+    def readEntries(self,offset):
+        """
+        Returns the entries of the IFD at offset as a list of (tag,type,
+        number,entry,position), 'entry' being the 12 bytes of the entry and
+        'position' the offset of its value, and the offset of the next IFD.
+        """
+        count=struct.unpack(self.endian+"H",self.read(offset,2))[0]
+        if count>MAX_ENTRIES:
+            raise ExifHeaderError("Invalid IFD")
+        data=self.read(offset+2,12*count+4)
+        entries=[]
+        for i in range(count):
+            entry=data[12*i:12*i+12]
+            tag,tiffType,number=struct.unpack(self.endian+"HHI",entry[0:8])
+            if tiffType in TIFF_TYPES and TIFF_TYPES[tiffType][0]*number<=4:
+                position=offset+2+12*i+8
+            else:
+                position=struct.unpack(self.endian+"I",entry[8:12])[0]
+            entries.append((tag,tiffType,number,entry,position))
+        return entries,struct.unpack(self.endian+"I",data[12*count:])[0]
+
+    def readIfd(self,offset,tags):
+        """Returns a dictionary name -> value of the given tags of an IFD"""
+        values={}
+        for tag,tiffType,number,entry,position in self.readEntries(offset)[0]:
+            if tag not in tags or tiffType not in TIFF_TYPES or number==0:
+                continue
+            if tag in POINTER_TAGS and (tiffType not in IFD_TYPES or number!=1):
+                continue
+            if tag==SUBIFDS_TAG and (tiffType not in IFD_TYPES or number>MAX_SUBIFDS):
+                continue
+            size,format=TIFF_TYPES[tiffType]
+            data=self.read(position,size*number)
+            if format=="s":
+                values[tags[tag]]=data.split("\x00")[0]
+            else:
+                values[tags[tag]]=struct.unpack(self.endian+format*number,data)
+        return values
+
+def rational(values,i):
+    """The float value of the i-th rational of a list of numerators/denominators"""
+    if values[2*i+1]==0:
+        raise ExifHeaderError("Invalid rational")
+    return float(values[2*i])/values[2*i+1]
+
+def emptyInfo():
+    return {"DateTimeOriginal":None,"width":None,"height":None,"lat":None,"lon":None,"ele":None}
+
+def fullImageSize(tiff,ifd0):
+    """
+    Returns the (width,height) of the full resolution image of a TIFF file,
+    or None if it isn't found. The IFD0 of the RAW files is often a small
+    preview (NEF, DNG), the image is then described by a SubIFD.
+    """
+    ifd=ifd0
+    subIfds=list(ifd0.get("SubIFDs",()))
+    while True:
+        # NewSubfileType 0 is a full resolution image
+        if ifd.get("NewSubfileType",(0,))[0]==0 and "ImageWidth" in ifd and "ImageHeight" in ifd:
+            return ifd["ImageWidth"][0],ifd["ImageHeight"][0]
+        if len(subIfds)==0:
+            return None
+        ifd=tiff.readIfd(subIfds.pop(0),SUBIFD_TAGS)
+
+def readTiffTags(tiff):
+    """
+    Returns the tags read by readExifHeader from a TiffReader, without the
+    JPEG image size.
+    """
+    info=emptyInfo()
+    ifd0=tiff.readIfd(tiff.first,IFD0_TAGS)
+    size=fullImageSize(tiff,ifd0)
+    if size is not None:
+        info["width"],info["height"]=size
+    if "ExifIFD" in ifd0:
+        exif=tiff.readIfd(ifd0["ExifIFD"][0],EXIF_TAGS)
+        if DATE_TIME.match(exif.get("DateTimeOriginal","")):
+            info["DateTimeOriginal"]=exif["DateTimeOriginal"][0:19]
+        if "ExifImageWidth" in exif and "ExifImageHeight" in exif:
+            info["width"],info["height"]=exif["ExifImageWidth"][0],exif["ExifImageHeight"][0]
+    if "GPSIFD" in ifd0:
+        gps=tiff.readIfd(ifd0["GPSIFD"][0],GPS_TAGS)
+        try:
+            lat,lon=gps["GPSLatitude"],gps["GPSLongitude"]
+            lat=rational(lat,0)+rational(lat,1)/60+rational(lat,2)/3600
+            lon=rational(lon,0)+rational(lon,1)/60+rational(lon,2)/3600
+            if gps.get("GPSLatitudeRef")=="S": lat=-lat
+            if gps.get("GPSLongitudeRef")=="W": lon=-lon
+            info["lat"],info["lon"]=lat,lon
+            ele=rational(gps["GPSAltitude"],0)
+            if gps.get("GPSAltitudeRef",(0,))[0]==1: ele=-ele
+            info["ele"]=ele
+        except (KeyError,IndexError,ExifHeaderError):
+            pass
+    return info
+
+def readJpegHeader(f):
+    """Returns the tags read by readExifHeader from a JPEG file"""
+    info=None
+    size=None
+    readBytes(f,2)
+    while size is None:
+        marker=readBytes(f,2)
+        if marker[0]!="\xff":
+            raise ExifHeaderError("Invalid JPEG marker")
+        if marker[1]=="\xff":
+            # padding
+            f.seek(-1,1)
+            continue
+        if marker[1] in ("\xd9","\xda"):
+            # end of the image or start of the image data
+            break
+        length=struct.unpack(">H",readBytes(f,2))[0]
+        if length<2:
+            raise ExifHeaderError("Invalid JPEG segment")
+        start=f.tell()
+        if ord(marker[1]) in SOF_MARKERS:
+            height,width=struct.unpack(">HH",readBytes(f,5)[1:5])
+            size=(width,height)
+        elif marker[1]=="\xe1" and info is None and readBytes(f,6)=="Exif\x00\x00":
+            info=readTiffTags(TiffReader(f,start+6,start+length-2))
+        f.seek(start+length-2)
+    if info is None:
+        info=emptyInfo()
+    if size is not None:
+        info["width"],info["height"]=size
+    return info
+
+def readExifHeader(fileName):
+    """
+    Reads the EXIF tags of a JPEG or TIFF based picture and returns a
+    dictionary:
+        'DateTimeOriginal': like '2007:02:12 16:09:10', None if missing
+        'width', 'height': the image size, None if unknown
+        'lat', 'lon': the decimal degrees of the GPS position, or None
+        'ele': the GPS altitude in meters, or None
+    Raises ExifHeaderError if the file isn't a JPEG or a TIFF file, or if
+    its EXIF data is invalid.
+    """
+    f=open(fileName,"rb")
+    try:
+        start=f.read(2)
+        f.seek(0)
+        if start=="\xff\xd8":
+            return readJpegHeader(f)
+        elif start in ("II","MM"):
+            return readTiffTags(TiffReader(f))
+        else:
+            raise ExifHeaderError("Not a JPEG or TIFF file")
+    except (struct.error,TypeError,IndexError,ValueError):
+        raise ExifHeaderError("Invalid EXIF data")
+    finally:
+        f.close()
+
+def degreesRationals(value):
+    """Returns the degrees, minutes, seconds rationals of an angle"""
+    micro=int(round(abs(value)*3600*1000000))
+    return (micro//3600000000,1,micro%3600000000//60000000,1,micro%60000000,1000000)
+
+def gpsTags(endian,lat,lon,ele=None):
+    """
+    Returns the GPS tags of a position as a dictionary
+    tag -> (type,number,value bytes)
+    """
+    if lat>=0: latRef="N\x00"
+    else: latRef="S\x00"
+    if lon>=0: lonRef="E\x00"
+    else: lonRef="W\x00"
+    tags={1:(ASCII,2,latRef),2:(RATIONAL,3,struct.pack(endian+"6I",*degreesRationals(lat))),
+    3:(ASCII,2,lonRef),4:(RATIONAL,3,struct.pack(endian+"6I",*degreesRationals(lon)))}
+    if ele is not None:
+        tags[5]=(BYTE,1,chr(int(ele<0)))
+        tags[6]=(RATIONAL,1,struct.pack(endian+"2I",int(round(abs(ele)*1000)),1000))
+    return tags
+
+def findExifSegment(f):
+    """
+    Returns (start,end) of the EXIF APP1 segment of a JPEG file, the
+    offsets of its marker and of the next segment.
+    """
+    f.seek(0)
+    if f.read(2)!="\xff\xd8":
+        raise ExifHeaderError("Not a JPEG file")
+    while True:
+        marker=readBytes(f,2)
+        if marker[0]!="\xff":
+            raise ExifHeaderError("Invalid JPEG marker")
+        if marker[1]=="\xff":
+            f.seek(-1,1)
+            continue
+        if marker[1] in ("\xd9","\xda"):
+            raise ExifHeaderError("No EXIF segment")
+        length=struct.unpack(">H",readBytes(f,2))[0]
+        if length<2:
+            raise ExifHeaderError("Invalid JPEG segment")
+        start=f.tell()-4
+        if marker[1]=="\xe1" and length>=16 and readBytes(f,6)=="Exif\x00\x00":
+            return start,start+2+length
+        f.seek(start+2+length)
+
+def newIfd(endian,offset,entries,nextIfd=0):
+    """
+    Returns the bytes of an IFD written at offset with its values, entries
+    being a dictionary tag -> 12 bytes entry or (type,number,value bytes).
+    """
+    count=len(entries)
+    dataOffset=offset+2+12*count+4
+    ifd=[struct.pack(endian+"H",count)]
+    data=[]
+    for tag in sorted(entries):
+        entry=entries[tag]
+        if isinstance(entry,str):
+            ifd.append(entry)
+            continue
+        tiffType,number,value=entry
+        if len(value)<=4:
+            ifd.append(struct.pack(endian+"HHI",tag,tiffType,number)+value.ljust(4,"\x00"))
+        else:
+            ifd.append(struct.pack(endian+"HHII",tag,tiffType,number,dataOffset))
+            data.append(value)
+            dataOffset+=len(value)
+    ifd.append(struct.pack(endian+"I",nextIfd))
+    return "".join(ifd+data)
+
+def writeJpegGps(fileName,lat,lon,ele=None,backup=None):
+    """
+    Writes a GPS position (decimal degrees, and the altitude in meters if
+    ele isn't None) in the EXIF header of a JPEG file. Returns True if the
+    values were replaced in place, False if the file was rewritten.
+    backup: a path, which must not exist, where the original file is kept
+    (copied before the values are replaced in place, renamed when the file
+    is rewritten)
+    Raises ExifHeaderError if it can't be done without exiftool: no EXIF
+    segment, invalid EXIF data or no room left in the segment.
+    """
+    f=open(fileName,"r+b")
+    try:
+        try:
+            start,end=findExifSegment(f)
+            base=start+10
+            tiff=TiffReader(f,base,end)
+            ifd0,nextIfd=tiff.readEntries(tiff.first)
+            pointers=[position for tag,tiffType,number,entry,position in ifd0
+            if tag==GPS_IFD_TAG and tiffType in IFD_TYPES and number==1]
+            gps=[]
+            if pointers:
+                gpsOffset=struct.unpack(tiff.endian+"I",tiff.read(pointers[0],4))[0]
+                gps=tiff.readEntries(gpsOffset)[0]
+            tags=gpsTags(tiff.endian,lat,lon,ele)
+            existing=dict([(tag,(tiffType,number,position)) for tag,tiffType,number,entry,position in gps])
+            if len([tag for tag in tags if existing.get(tag,(None,None))[0:2]==tags[tag][0:2]])==len(tags):
+                # same tags and sizes: only their values are replaced, if
+                # they are all inside the EXIF segment
+                for tag,(tiffType,number,value) in tags.items():
+                    if existing[tag][2]<0 or base+existing[tag][2]+len(value)>end:
+                        raise ExifHeaderError("GPS value out of the EXIF segment")
+                if backup is not None:
+                    shutil.copy2(fileName,backup)
+                for tag,(tiffType,number,value) in tags.items():
+                    f.seek(base+existing[tag][2])
+                    f.write(value)
+                return True
+            f.seek(base)
+            data=readBytes(f,end-base)
+        except (struct.error,TypeError,IndexError,ValueError):
+            raise ExifHeaderError("Invalid EXIF data")
+    finally:
+        f.close()
+    # a new GPS IFD (and IFD0 if it has no GPS IFD pointer) at the end of
+    # the segment, the other values don't move
+    if len(data)%2: data+="\x00"
+    entries=dict([(tag,entry) for tag,tiffType,number,entry,position in gps])
+    entries.update(tags)
+    if 0 not in entries:
+        entries[0]=(BYTE,4,GPS_VERSION)
+    gpsOffset=len(data)
+    data+=newIfd(tiff.endian,gpsOffset,entries)
+    if pointers:
+        data=data[:pointers[0]]+struct.pack(tiff.endian+"I",gpsOffset)+data[pointers[0]+4:]
+    else:
+        if len(data)%2: data+="\x00"
+        entries=dict([(tag,entry) for tag,tiffType,number,entry,position in ifd0])
+        entries[GPS_IFD_TAG]=(LONG,1,struct.pack(tiff.endian+"I",gpsOffset))
+        ifd0Offset=len(data)
+        data+=newIfd(tiff.endian,ifd0Offset,entries,nextIfd)
+        data=data[:4]+struct.pack(tiff.endian+"I",ifd0Offset)+data[8:]
+    if 10+len(data)>MAX_SEGMENT+2:
+        raise ExifHeaderError("No room left in the EXIF segment")
+    segment="\xff\xe1"+struct.pack(">H",8+len(data))+"Exif\x00\x00"+data
+    replaceSegment(fileName,start,end,segment,backup)
+    return False
+
+def replaceSegment(fileName,start,end,segment,backup=None):
+    """
+    Replaces the bytes start-end of a file by segment, writing a new file
+    renamed over the old one once complete.
+    backup: a path, which must not exist, where the old file is renamed
+    """
+    directory=os.path.dirname(os.path.abspath(fileName))
+    handle,temporary=tempfile.mkstemp(dir=directory,prefix=".gpicsync-")
+    try:
+        new=os.fdopen(handle,"wb")
+        try:
+            f=open(fileName,"rb")
+            try:
+                new.write(readBytes(f,start))
+                new.write(segment)
+                f.seek(end)
+                shutil.copyfileobj(f,new,1024*1024)
+            finally:
+                f.close()
+            new.flush()
+            os.fsync(new.fileno())
+        finally:
+            new.close()
+        shutil.copymode(fileName,temporary)
+        if backup is not None:
+            os.rename(fileName,backup)
+            try:
+                os.rename(temporary,fileName)
+            except:
+                os.rename(backup,fileName)
+                raise
+        elif sys.platform=='win32':
+            # rename doesn't replace an existing file: the picture is moved
+            # aside and deleted only once the new file has its name, so a
+            # crash always leaves one of them on disk
+            aside=temporary+".old"
+            os.rename(fileName,aside)
+            try:
+                os.rename(temporary,fileName)
+            except:
+                os.rename(aside,fileName)
+                raise
+            os.remove(aside)
+        else:
+            os.rename(temporary,fileName)
+    except:
+        if os.path.exists(temporary): os.remove(temporary)
+        raise
+
+if __name__=="__main__":
+    import sys
+    for fileName in sys.argv[1:]:
+        print fileName,readExifHeader(fileName)
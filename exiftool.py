@@ -0,0 +1,270 @@
+#!/usr/bin/python
+
+###############################################################################
+#
+# This script is released under the GPL v2 license
+#
+###############################################################################
+
+"""
+Long-lived exiftool processes for gpicsync.
+
+Starting exiftool (a perl script) takes a few hundred milliseconds, more
+than reading or writing the tags of a picture. Instead of a new exiftool
+per command, the commands are sent to processes started once with
+'exiftool -stay_open True -@ -': the arguments of a command are written on
+their standard input, one per line, followed by '-execute<n>', and
+exiftool prints the output of the command followed by '{ready<n>}'.
+
+    output=runExiftool(["-DateTimeOriginal","-ImageSize","picture.jpg"])
+
+The processes are kept in an ExifToolPool, started on demand (up to
+MAX_PROCESSES when several threads run commands at the same time) and
+stopped when python exits. exiftool 8.42 or newer is needed, 9.79 on
+Windows where the file names are passed in UTF-8 with
+'-charset filename=utf8'.
+
+runExiftoolCommands runs many commands (like a write per picture) sending
+them in batches, without waiting for each output before the next command.
+"""
+
+import os,sys,subprocess,threading,atexit
+
+if sys.platform == 'win32':
+    EXIFTOOL='exiftool.exe'
+    # the arguments are UTF-8 (see encodeArgument), the file names too
+    COMMON_ARGS=["-charset","filename=utf8"]
+    # the file names given as byte strings (from os.listdir with a byte
+    # string directory, the configuration file...) are in the ANSI code page
+    FILE_NAME_ENCODING=sys.getfilesystemencoding()
+else:
+    EXIFTOOL='exiftool'
+    COMMON_ARGS=[]
+    FILE_NAME_ENCODING="utf-8"
+
+MAX_PROCESSES=4
+BATCH_SIZE=50 # commands sent at once by runExiftoolCommands
+
+class ExifToolError(Exception):
+    """Raised when an exiftool process stops unexpectedly"""
+    pass
+
+def encodeArgument(arg):
+    """
+    Returns a command argument as a byte string, UTF-8 like exiftool expects.
+    On Windows the byte string file names (the arguments which aren't an
+    option or a tag, starting with '-') are converted from the ANSI code
+    page, the other byte strings must be UTF-8.
+    """
+    if sys.platform=='win32' and isinstance(arg,str) and not arg.startswith("-"):
+        arg=arg.decode(FILE_NAME_ENCODING)
+    if isinstance(arg,unicode):
+        arg=arg.encode("utf-8")
+    if "\n" in arg:
+        raise ValueError("exiftool arguments can't contain new lines: %r" % arg)
+    return arg
+
+class ExifToolProcess(object):
+    """An exiftool process running the commands sent on its standard input"""
+    def __init__(self,executable=EXIFTOOL):
+        # stderr isn't captured, exiftool errors are shown as with os.popen
+        command=[executable,"-stay_open","True","-@","-"]
+        if COMMON_ARGS:
+            command+=["-common_args"]+COMMON_ARGS
+        self.process=subprocess.Popen(command,stdin=subprocess.PIPE,stdout=subprocess.PIPE)
+        self.count=0
+
+    def execute(self,args):
+        """Runs exiftool with the arguments list args and returns its output"""
+        return self.executeMany([args])[0]
+
+    def executeMany(self,commands):
+        """
+        Runs several exiftool commands (arguments lists) sent at once, without
+        waiting for the output of a command before sending the next one, and
+        returns the list of their outputs. Raises ValueError, before sending
+        anything, if an argument can't be sent (see encodeArgument).
+        """
+        first=self.count+1
+        data=[]
+        for args in commands:
+            data.append("".join([encodeArgument(arg)+"\n" for arg in args]))
+        for n in range(len(data)):
+            self.count+=1
+            data[n]+="-execute%d\n" % self.count
+        try:
+            self.process.stdin.write("".join(data))
+            self.process.stdin.flush()
+        except IOError,e:
+            raise ExifToolError("exiftool stopped: %s" % e)
+        return [self.readOutput(n) for n in range(first,self.count+1)]
+
+    def readOutput(self,n):
+        """Reads the output of the command n, up to its '{ready<n>}' line"""
+        ready="{ready%d}" % n
+        output=[]
+        while True:
+            line=self.process.stdout.readline()
+            if line=="":
+                raise ExifToolError("exiftool stopped")
+            if line.rstrip("\r\n")==ready:
+                break
+            output.append(line)
+        return "".join(output)
+
+    def close(self):
+        """Stops the exiftool process"""
+        try:
+            self.process.stdin.write("-stay_open\nFalse\n")
+            self.process.stdin.close()
+            self.process.wait()
+        except (IOError,OSError):
+            pass
+
+class ExifToolPool(object):
+    """
+    A set of ExifToolProcess shared by threads, a process runs a command at
+    a time and a new one is started when all are busy, up to 'size'.
+    """
+    def __init__(self,executable=EXIFTOOL,size=MAX_PROCESSES):
+        self.executable=executable
+        self.size=size
+        self.idle=[] # processes waiting for a command
+        self.started=0
+        self.lock=threading.Lock()
+        self.available=threading.Condition(self.lock)
+
+    def acquire(self):
+        """Returns an idle process, started if needed"""
+        self.available.acquire()
+        try:
+            while len(self.idle)==0 and self.started>=self.size:
+                self.available.wait()
+            if len(self.idle)>0:
+                return self.idle.pop()
+            self.started+=1
+        finally:
+            self.available.release()
+        try:
+            return ExifToolProcess(self.executable)
+        except:
+            self.release(None)
+            raise
+
+    def release(self,process):
+        """Puts back a process in the pool, None if it was stopped"""
+        self.available.acquire()
+        try:
+            if process is None: self.started-=1
+            else: self.idle.append(process)
+            self.available.notify()
+        finally:
+            self.available.release()
+
+    def execute(self,args):
+        """Runs exiftool with the arguments list args and returns its output"""
+        process=self.acquire()
+        try:
+            output=process.execute(args)
+        except ExifToolError:
+            # run the command again in a new process
+            process.close()
+            self.release(None)
+            process=self.acquire()
+            try:
+                output=process.execute(args)
+            except:
+                process.close()
+                self.release(None)
+                raise
+        except:
+            process.close()
+            self.release(None)
+            raise
+        self.release(process)
+        return output
+
+    def executeMany(self,commands):
+        """
+        Runs several commands in the same process (see
+        ExifToolProcess.executeMany) and returns the list of their outputs.
+        Unlike execute, the commands aren't run again if the process stops
+        (some of them may have been run already).
+        """
+        process=self.acquire()
+        try:
+            outputs=process.executeMany(commands)
+        except:
+            process.close()
+            self.release(None)
+            raise
+        self.release(process)
+        return outputs
+
+    def close(self):
+        """Stops the idle processes"""
+        self.available.acquire()
+        try:
+            for process in self.idle:
+                process.close()
+                self.started-=1
+            self.idle=[]
+        finally:
+            self.available.release()
+
+pool=None
+poolLock=threading.Lock()
+
+def sharedPool():
+    """Returns the pool of exiftool processes shared by gpicsync"""
+    global pool
+    poolLock.acquire()
+    try:
+        if pool is None:
+            pool=ExifToolPool()
+            atexit.register(pool.close)
+    finally:
+        poolLock.release()
+    return pool
+
+def runExiftool(args):
+    """
+    Runs exiftool with the arguments list args in the shared pool of
+    exiftool processes and returns its output ("" if exiftool can't be
+    started or the arguments can't be sent).
+    """
+    try:
+        for arg in args: encodeArgument(arg)
+    except ValueError,e:
+        print "Couldn't run %s: %s" % (EXIFTOOL,e)
+        return ""
+    try:
+        return sharedPool().execute(args)
+    except (OSError,ExifToolError),e:
+        print "Couldn't run %s: %s" % (EXIFTOOL,e)
+        return ""
+
+def runExiftoolCommands(commands):
+    """
+    Runs many exiftool commands (arguments lists) in batches of BATCH_SIZE
+    commands sent at once to a process of the shared pool, and returns the
+    list of their outputs ("" for the commands of a batch which couldn't
+    be run, and for the commands with arguments which can't be sent, like
+    a file name with a new line, the other commands being run).
+    """
+    outputs=[""]*len(commands)
+    valid=[] # indexes of the commands which can be sent
+    for i,args in enumerate(commands):
+        try:
+            for arg in args: encodeArgument(arg)
+            valid.append(i)
+        except ValueError,e:
+            print "Couldn't run %s: %s" % (EXIFTOOL,e)
+    for first in range(0,len(valid),BATCH_SIZE):
+        batch=valid[first:first+BATCH_SIZE]
+        try:
+            for i,output in zip(batch,sharedPool().executeMany([commands[i] for i in batch])):
+                outputs[i]=output
+        except (OSError,ExifToolError),e:
+            print "Couldn't run %s: %s" % (EXIFTOOL,e)
+    return outputs
@@ -0,0 +1,170 @@
+#!/usr/bin/python
+
+###############################################################################
+#
+# This script is released under the GPL v2 license
+#
+###############################################################################
+
+"""
+A reader for the binary Garmin FIT activity files.
+
+Only the 'record' messages are decoded (time, position and altitude), the
+other messages are skipped using their definitions. The points are returned
+as a Track like the ones read from gpx files.
+"""
+
+import struct
+from track import *
+
+FIT_EPOCH=631065600 # 1989-12-31T00:00:00Z, the origin of the FIT timestamps
+SEMICIRCLES=180.0/2**31 # degrees per semicircle
+
+RECORD_MESSAGE=20
+TIMESTAMP_FIELD=253
+# fields of the record message used: number -> (name, size, struct format)
+RECORD_FIELDS={
+    TIMESTAMP_FIELD:("time",4,"I"),
+    0:("lat",4,"i"),
+    1:("lon",4,"i"),
+    2:("altitude",2,"H"),
+    78:("enhancedAltitude",4,"I"),
+}
+# 'invalid' value of each struct format
+INVALID={"I":0xFFFFFFFF,"i":0x7FFFFFFF,"H":0xFFFF}
+
+class FitError(Exception):
+    """Raised when a file isn't a valid FIT file"""
+    pass
+
+class FitDefinition(object):
+    """The layout of the data messages of a local message type"""
+    def __init__(self,globalNumber,endian,fields,size):
+        self.globalNumber=globalNumber
+        self.size=size # total size of a data message
+        # (name,offset,format) of the fields to decode
+        self.fields=[]
+        # offset of the timestamp field, also used by the other messages
+        self.timestamp=None
+        offset=0
+        for number,fieldSize in fields:
+            if number==TIMESTAMP_FIELD and fieldSize==4:
+                self.timestamp=struct.Struct(endian+"I"),offset
+            if globalNumber==RECORD_MESSAGE and number in RECORD_FIELDS:
+                name,expectedSize,format=RECORD_FIELDS[number]
+                if fieldSize==expectedSize:
+                    self.fields.append((name,struct.Struct(endian+format),offset,INVALID[format]))
+            offset+=fieldSize
+
+def readBytes(f,size):
+    """Read exactly size bytes from f"""
+    data=f.read(size)
+    if len(data)!=size:
+        raise FitError("Unexpected end of FIT file")
+    return data
+
+def readFit(fileName):
+    """
+    Generator reading a FIT file record by record.
+    Yields a tuple (time,lat,lon,ele) per record having a time and a position,
+    time in epoch seconds and ele NaN when there is no altitude.
+    Chained FIT files (several FIT files one after the other) are read too.
+    """
+    f=openTrackFile(fileName)
+    try:
+        try:
+            while True:
+                first=f.read(1)
+                if first=="":
+                    break
+                headerSize=ord(first)
+                header=first+readBytes(f,headerSize-1)
+                if headerSize<12 or header[8:12]!=".FIT":
+                    raise FitError("Not a FIT file: %s" % fileName)
+                dataSize=struct.unpack("<I",header[4:8])[0]
+                for point in readFitData(f,dataSize):
+                    yield point
+                readBytes(f,2) # CRC of the file
+        except FitError,e:
+            # a truncated file: keep the points read before the error
+            print "Warning: stopped reading the invalid FIT file",fileName,":",e
+    finally:
+        f.close()
+
+def readFitData(f,dataSize):
+    """Generator of the points of the dataSize bytes of FIT records in f"""
+    definitions={}
+    lastTime=None
+    remaining=dataSize
+    while remaining>0:
+        recordHeader=ord(readBytes(f,1))
+        remaining-=1
+        compressedTime=None
+        if recordHeader & 0x80:
+            # compressed timestamp header, 5 bits of time offset
+            localType=(recordHeader>>5) & 0x03
+            compressedTime=recordHeader & 0x1F
+        elif recordHeader & 0x40:
+            # definition message
+            localType=recordHeader & 0x0F
+            reserved,architecture=struct.unpack("BB",readBytes(f,2))
+            if architecture==1: endian=">"
+            else: endian="<"
+            globalNumber,fieldCount=struct.unpack(endian+"HB",readBytes(f,3))
+            fields=[]
+            size=0
+            for i in xrange(fieldCount):
+                number,fieldSize,baseType=struct.unpack("BBB",readBytes(f,3))
+                fields.append((number,fieldSize))
+                size+=fieldSize
+            remaining-=5+3*fieldCount
+            if recordHeader & 0x20:
+                # developer fields, skipped
+                developerCount=ord(readBytes(f,1))
+                for i in xrange(developerCount):
+                    number,fieldSize,index=struct.unpack("BBB",readBytes(f,3))
+                    size+=fieldSize
+                remaining-=1+3*developerCount
+            definitions[localType]=FitDefinition(globalNumber,endian,fields,size)
+            continue
+        else:
+            localType=recordHeader & 0x0F
+        definition=definitions.get(localType)
+        if definition is None:
+            raise FitError("FIT data message without definition")
+        data=readBytes(f,definition.size)
+        remaining-=definition.size
+        if definition.timestamp is not None:
+            fieldStruct,offset=definition.timestamp
+            value=fieldStruct.unpack_from(data,offset)[0]
+            if value!=INVALID["I"]: lastTime=value
+        elif compressedTime is not None and lastTime is not None:
+            if compressedTime>=(lastTime & 0x1F):
+                lastTime=(lastTime & ~0x1F)+compressedTime
+            else:
+                lastTime=(lastTime & ~0x1F)+compressedTime+0x20
+        if definition.globalNumber!=RECORD_MESSAGE or lastTime is None:
+            continue
+        values={}
+        for name,fieldStruct,offset,invalid in definition.fields:
+            value=fieldStruct.unpack_from(data,offset)[0]
+            if value!=invalid:
+                values[name]=value
+        if "lat" not in values or "lon" not in values:
+            continue
+        if "enhancedAltitude" in values:
+            ele=values["enhancedAltitude"]/5.0-500
+        elif "altitude" in values:
+            ele=values["altitude"]/5.0-500
+        else:
+            ele=NAN
+        yield (lastTime+FIT_EPOCH,values["lat"]*SEMICIRCLES,values["lon"]*SEMICIRCLES,ele)
+
+def parseFit(fileName,window=None):
+    """
+    Returns a Track with the records of a FIT file, sorted by time
+    window: only keep the records of this (start,end) time range, see buildTrack
+    """
+    track=buildTrack(readFit(fileName),window)
+    print "Number of FIT records kept: ",len(track)
+    return track
@@ -15,23 +15,32 @@
 # http://www.sno.phy.queensu.ca/%7Ephil/exiftool/
 ###############################################################################
 
-import os,sys
+import os,sys,re,time,threading,sqlite3
+import json
+from exiftool import runExiftool,runExiftoolCommands,FILE_NAME_ENCODING
+from exifheader import readExifHeader,writeJpegGps,ExifHeaderError
+from sidecar import isRaw,sidecarPath,writeSidecar
+from exifcache import ExifCache,CACHE_FILE
+
+PATCH_JPEG=True # write the positions in the JPEG files without exiftool when possible
+USE_CACHE=True # keep the tags read in a cache (see exifcache.py)
 
 class GeoExif(object):
     """
     A class to read and write few EXIF tags in .jpg pictures which can be 
     usefull for geolalisation scripts.
     """
-    def __init__(self,picture):
+    def __init__(self,picture,xmpSidecar=False):
+        """
+        xmpSidecar: write the positions of the RAW pictures in a .xmp
+        sidecar file instead of the picture (see sidecar.py)
+        """
         self.picPath=picture
-        self.xmpOption=False
+        self.xmpOption=xmpSidecar and isRaw(picture)
         if self.xmpOption==True:
-            if os.path.basename(picture).find(".CRW")>0\
-            or os.path.basename(picture).find(".CR2")>0:
-                self.sidecarFile = os.path.splitext(picture)[0]+".xmp"
-                #print ">>>>> self.sidecarFile",self.sidecarFile
-            else:
-                self.sidecarFile = ''
+            self.sidecarFile=sidecarPath(picture)
+        else:
+            self.sidecarFile = ''
         if sys.platform == 'win32':
             self.exifcmd = 'exiftool.exe'
         else:
@@ -39,19 +48,26 @@ class GeoExif(object):
         
     def readExifAll(self):
         """read all exif tags and return a string of the result"""
-        result=os.popen('%s -n "%s"' % (self.exifcmd, self.picPath)).read()
+        result=runExiftool(["-n",self.picPath])
         return result
     
+    def readInfo(self):
+        """
+        Returns the Date/Time Original, size and GPS position of the picture
+        like readPicturesInfo (from the cache of the tags if it didn't change)
+        """
+        return readPicturesInfo([self.picPath])[self.picPath]
+
     def readDateTime(self):
         """
         Read the time and date when the picture was taken if available
         and return a list containing two strings [date,time]
-        like  ['2007:02:12', '16:09:10']
+        like  ['2007:02:12', '16:09:10'] (['',''] if not available)
         """
-        #result=os.popen('exiftool.exe -CreateDate "%s"' % self.picPath).read()
-        result=os.popen('%s -DateTimeOriginal "%s"' % (self.exifcmd, self.picPath)).read()
-        timeDate= [result[34:44],result[45:53]]
-        return timeDate
+        dateTimeSize=self.readInfo()["dateTimeSize"]
+        if dateTimeSize[0]=="nodate":
+            return ["",""]
+        return dateTimeSize[0:2]
     
     def readDateTimeSize(self):
         """
@@ -59,72 +75,38 @@ class GeoExif(object):
         plus the size of the picture
         Returns a list containing strings[date,time,width,height]
         like  ['2007:02:12', '16:09:10','800','600']
+        The EXIF header is read directly when possible (see exifheader.py),
+        exiftool is used for the other pictures.
         """
-        answer=os.popen('%s -DateTimeOriginal -ImageSize "%s"' % (self.exifcmd, self.picPath)).read()
-        print "readDateTimeSize answer", answer
-        if "Date" in answer:
-            date=answer[34:44]
-            time=answer[45:53]
-        else:
-            date,time="nodate","notime"
-        #timeDate= [answer[34:44],answer[45:53]]
-        try:
-            size=answer.split("Image Size")[1].split(":")[1].strip().split("x")
-            width=size[0]
-            height=size[1]
-        except:
-            width=640
-            height=480
-        return [date,time,width,height]
+        return list(self.readInfo()["dateTimeSize"])
     
     def readLatitude(self):
-        """read the latitute tag is available and return a float"""
-        result=os.popen('%s -n -GPSLatitude -GPSLatitudeRef  "%s"  ' % (self.exifcmd, self.picPath)).read().split("\n")
-        #print result
-        if len(result)>1:
-            latitude=float(result[0].split(":")[1])
-            #print "latitude= ",latitude
-            return latitude
-        else:
+        """read the latitute tag is available and return a float (negative in the south)"""
+        latitude=self.readInfo()["lat"]
+        if latitude is None:
             return "None"
+        return latitude
         
     def readLongitude(self):
-        """read the longitude tag if available"""
-        result=os.popen('%s -n -GPSLongitude -GPSLongitudeRef   "%s" ' % (self.exifcmd, self.picPath)).read().split("\n")
-        #print result
-        if len(result)>1:
-            longitude=float(result[0].split(":")[1])
-            #print "longitude= ",longitude
-            return longitude
-        else:
+        """read the longitude tag if available (negative in the west)"""
+        longitude=self.readInfo()["lon"]
+        if longitude is None:
             return "None"
+        return longitude
     
     def readLatLong(self):
-        """read latitude AND longitude at the same time"""
-        result=os.popen('%s  -n -GPSLatitude -GPSLatitudeRef \
-        -GPSLongitude -GPSLongitudeRef   "%s" ' \
-        % (self.exifcmd, self.picPath)).read().split("\n")
-        print result
-        if len(result)>=4:
-            result[0]=result[0].split(":")[1].strip()
-            try:
-                latDecimal=result[0].split(".")[1][0:]
-            except:
-                latDecimal="0"
-            result[0]=result[0].split(".")[0]+"."+latDecimal
-            result[1]=result[1].split(":")[1].strip()
-            result[2]=result[2].split(":")[1].strip()
-            try:
-                longDecimal=result[2].split(".")[1][0:]
-            except:
-                longDecimal="0"
-            result[2]=result[2].split(".")[0]+"."+longDecimal
-            result[3]=result[3].split(":")[1].strip()
-            latlong= result[1]+result[0]+" "+result[3]+result[2]
-        else:
-            latlong=None
-        print latlong
-        return latlong
+        """
+        read latitude AND longitude at the same time, returns a string
+        like 'N45.51 W6.1166' or None
+        """
+        info=self.readInfo()
+        if info["lat"] is None:
+            return None
+        if info["lat"]>=0: latRef="N"
+        else: latRef="S"
+        if info["lon"]>=0: longRef="E"
+        else: longRef="W"
+        return latRef+repr(abs(info["lat"]))+" "+longRef+repr(abs(info["lon"]))
 
     def writeLatitude(self,lat):
         """
@@ -133,16 +115,17 @@ class GeoExif(object):
         nagative means southest latitudes
         lat can be a float or a string
         """
-        option=''
+        option=[]
         if self.xmpOption==True:
             if(self.sidecarFile != ""):
-                option = option + " -o '"+self.sidecarFile+"'"
+                option = option + ["-o",self.sidecarFile]
         #os.popen('exiftool.exe -GPSAltitudeRef=0 -GPSAltitude=100 '+ self.picPath)
         if float(lat) >= 0:
-            os.popen('%s -m -GPSLatitudeRef="N" %s "%s" '% (self.exifcmd, option, self.picPath))
+            runExiftool(["-m","-GPSLatitudeRef=N"]+option+[self.picPath])
         else:
-            os.popen('%s -m -GPSLatitudeRef="S" %s "%s" '% (self.exifcmd, option, self.picPath))    
-        os.popen('%s  -m -GPSLatitude=%s "%s"'%(self.exifcmd, lat,self.picPath))
+            runExiftool(["-m","-GPSLatitudeRef=S"]+option+[self.picPath])
+        runExiftool(["-m","-GPSLatitude=%s" % lat,self.picPath])
+        forgetPictures([self.picPath])
         
     def writeLongitude(self,long):
         """
@@ -151,23 +134,81 @@ class GeoExif(object):
         nagative means Western latitudes
         long can be a float or a string
         """
-        option=''
+        option=[]
         if self.xmpOption==True:
             if(self.sidecarFile != ""):
-                option = option + " -o '"+self.sidecarFile+"'"
+                option = option + ["-o",self.sidecarFile]
         if float(long) >= 0:
-            os.popen('%s -m -GPSLongitudeRef="E" %s "%s"' % (self.exifcmd, option, self.picPath))
+            runExiftool(["-m","-GPSLongitudeRef=E"]+option+[self.picPath])
         else:
-            os.popen('%s -m -GPSLongitudeRef="W" %s "%s"' % (self.exifcmd, option, self.picPath))
-        os.popen('%s -m -GPSLongitude=%s  "%s" '% (self.exifcmd, long,self.picPath))
+            runExiftool(["-m","-GPSLongitudeRef=W"]+option+[self.picPath])
+        runExiftool(["-m","-GPSLongitude=%s" % long,self.picPath])
+        forgetPictures([self.picPath])
         
-    def writeLatLong(self,lat,long,latRef,longRef,backup,elevation="None"):
-        """Write both latitudeRef/latitude and longitudeRef/longitude in EXIF"""
-        option='"-DateTimeOriginal>FileModifyDate"'
+    def writeLatLong(self,lat,long,latRef,longRef,backup,elevation="None",tags=()):
+        """
+        Write both latitudeRef/latitude and longitudeRef/longitude in EXIF
+        tags: more exiftool arguments (like '-keywords=...') written at the
+        same time, the picture being rewritten only once
+        """
+        try:
+            if not self.patchLatLong(lat,long,latRef,longRef,backup,elevation,tags):
+                runExiftool(self.latLongArgs(lat,long,latRef,longRef,backup,elevation,tags))
+        finally:
+            forgetPictures([self.picPath])
+
+    def patchLatLong(self,lat,long,latRef,longRef,backup,elevation="None",tags=()):
+        """
+        Writes the position like writeLatLong but without exiftool when
+        there are no other tags to write: creates the xmp sidecar (see
+        sidecar.py) or patches the EXIF header of the JPEG pictures (see
+        exifheader.writeJpegGps). Returns False if exiftool must be used.
+        """
+        if len(tags)>0:
+            return False
+        lat,long,elevation=signedPosition(lat,long,latRef,longRef,elevation)
         if self.xmpOption==True:
-            if(self.sidecarFile != ""):
-                option = option + " -o '"+self.sidecarFile+"'"
-                #print "option: ,option
+            if os.path.exists(self.sidecarFile):
+                # updated by exiftool to keep its other tags
+                return False
+            try:
+                writeSidecar(self.sidecarFile,lat,long,elevation)
+            except (IOError,OSError):
+                return False
+            return True
+        if not PATCH_JPEG\
+        or os.path.splitext(self.picPath)[1].lower() not in (".jpg",".jpeg"):
+            return False
+        try:
+            header=readExifHeader(self.picPath)
+            original=None
+            if backup and not os.path.exists(self.picPath+"_original"):
+                # like exiftool
+                original=self.picPath+"_original"
+            writeJpegGps(self.picPath,lat,long,elevation,original)
+        except (IOError,OSError,ExifHeaderError):
+            return False
+        if header["DateTimeOriginal"] is not None:
+            # -DateTimeOriginal>FileModifyDate
+            modified=time.mktime(time.strptime(header["DateTimeOriginal"],"%Y:%m:%d %H:%M:%S"))
+            os.utime(self.picPath,(os.stat(self.picPath).st_atime,modified))
+        return True
+
+    def latLongArgs(self,lat,long,latRef,longRef,backup,elevation="None",tags=()):
+        """Returns the exiftool arguments used by writeLatLong"""
+        option=["-DateTimeOriginal>FileModifyDate"]
+        if self.xmpOption==True:
+            # the xmp coordinates have no Ref tags, the sign gives the hemisphere
+            lat,long,ele=signedPosition(lat,long,latRef,longRef,elevation)
+            args=["-n","-m","-GPSLatitude=%r" % lat,"-GPSLongitude=%r" % long]
+            if ele is not None:
+                args+=["-GPSAltitudeRef=%d" % int(ele<0),"-GPSAltitude=%r" % abs(ele)]
+            if os.path.exists(self.sidecarFile):
+                if backup==False:
+                    args.append("-overwrite_original")
+                return args+list(tags)+[self.sidecarFile]
+            # a new sidecar with the tags of the picture
+            return args+list(tags)+["-o",self.sidecarFile,self.picPath]
         if float(long)<0:long=str(abs(float(long)))
         if float(lat)<0:lat=str(abs(float(lat)))
         altRef=0 #"Above Sea Level"
@@ -179,25 +220,208 @@ class GeoExif(object):
         #print ">>> altRef=",altRef
         #print ">>> elevation ", elevation
             
-        if backup==True:
-            if elevation=="None":
-                os.popen('%s -n -m -GPSLongitude=%s -GPSLatitude=%s \
-                -GPSLongitudeRef=%s -GPSLatitudeRef=%s  %s "%s" '\
-                %(self.exifcmd, long,lat,longRef,latRef,option,self.picPath))
-            else:
-                os.popen('%s -n -m -GPSLongitude=%s -GPSLatitude=%s -GPSLongitudeRef=%s \
-                -GPSLatitudeRef=%s  -GPSAltitudeRef=%s -GPSAltitude=%s %s "%s" '\
-                %(self.exifcmd, long,lat,longRef,latRef,altRef,elevation,option,self.picPath))
-        else:
-            if elevation=="None":
-                os.popen('%s -m -overwrite_original -n -GPSLongitude=%s -GPSLatitude=%s \
-                -GPSLongitudeRef=%s -GPSLatitudeRef=%s  %s "%s" '\
-                %(self.exifcmd, long,lat,longRef,latRef,option, self.picPath))
-            else:
-                os.popen('%s -m -overwrite_original -n -GPSLongitude=%s -GPSLatitude=%s \
-                -GPSLongitudeRef=%s -GPSLatitudeRef=%s -GPSAltitudeRef=%s -GPSAltitude=%s %s "%s"'\
-                %(self.exifcmd, long,lat,longRef,latRef,altRef,elevation,option,self.picPath))
-            
+        args=["-n","-m"]
+        if backup==False:
+            args.append("-overwrite_original")
+        args+=["-GPSLongitude=%s" % long,"-GPSLatitude=%s" % lat,
+        "-GPSLongitudeRef=%s" % longRef,"-GPSLatitudeRef=%s" % latRef]
+        if elevation!="None":
+            args+=["-GPSAltitudeRef=%s" % altRef,"-GPSAltitude=%s" % elevation]
+        return args+list(tags)+option+[self.picPath]
+
+def signedPosition(lat,long,latRef,longRef,elevation):
+    """
+    Returns the floats (lat,long,elevation) of the arguments of
+    GeoExif.writeLatLong, negative in the south and west, elevation None
+    if unknown.
+    """
+    lat=abs(float(lat))
+    if latRef=="S": lat=-lat
+    long=abs(float(long))
+    if longRef=="W": long=-long
+    if elevation=="None": elevation=None
+    else: elevation=float(elevation)
+    return lat,long,elevation
+
+WRITE_BATCH=100 # pictures written at once by the callers of GpsWriter
+
+class GpsWriter(object):
+    """
+    Writes the positions of many pictures: the exiftool commands (one per
+    picture, like GeoExif.writeLatLong) are collected and sent at once to
+    an exiftool process (see runExiftoolCommands). The JPEG pictures and
+    the new xmp sidecars are written without exiftool when possible (see
+    GeoExif.patchLatLong).
+
+        writer=GpsWriter(backup)
+        writer.add("picture.jpg","45.5","6.2","N","E","250")
+        for picture,written in writer.write():
+            ...
+    """
+    def __init__(self,backup=True,xmpSidecar=False):
+        """xmpSidecar: see GeoExif"""
+        self.backup=backup
+        self.xmpSidecar=xmpSidecar
+        self.positions=[] # (picture,arguments of writeLatLong)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def add(self,picture,lat,long,latRef,longRef,elevation="None",tags=()):
+        """Adds a position to write, arguments like GeoExif.writeLatLong"""
+        self.positions.append((picture,(lat,long,latRef,longRef,self.backup,elevation,tags)))
+
+    def write(self):
+        """
+        Writes the positions added and returns a list of (picture,written),
+        written being False if exiftool didn't update the picture.
+        """
+        written={}
+        pictures=[]
+        commands=[]
+        try:
+            for picture,args in self.positions:
+                pic=GeoExif(picture,self.xmpSidecar)
+                if pic.patchLatLong(*args):
+                    written[picture]=True
+                else:
+                    pictures.append(picture)
+                    commands.append(pic.latLongArgs(*args))
+            for picture,output in zip(pictures,runExiftoolCommands(commands)):
+                written[picture]=isWritten(output)
+        finally:
+            # even the pictures exiftool failed to write may have changed
+            forgetPictures([picture for picture,args in self.positions])
+        results=[(picture,written[picture]) for picture,args in self.positions]
+        self.positions=[]
+        return results
+
+def isWritten(answer):
+    """True if the output of an exiftool write command reports a file written"""
+    return re.search(r"\b1 image files (updated|created|unchanged)",answer) is not None
+
+def readPicturesInfo(pictures):
+    """
+    Reads the Date/Time Original, size and GPS position of many pictures
+    from the cache of the tags (see exifcache.py), their EXIF header (see
+    readHeaderInfo) or, for the others, with a single exiftool command
+    (-json) instead of a command per picture.
+    Returns a dictionary with for each picture a dictionary:
+        'dateTimeSize': [date,time,width,height] like GeoExif.readDateTimeSize
+        'lat', 'lon': the decimal degrees of the GPS position, or None
+        'ele': the GPS altitude in meters, or None
+    """
+    pictures=list(pictures)
+    cache=sharedCache()
+    if cache is not None:
+        infos=cache.get(pictures)
+    else:
+        infos={}
+    read={} # the infos to save in the cache
+    names={} # the pictures by the name in the exiftool output
+    remaining=[] # the pictures read with exiftool
+    for picture in pictures:
+        if picture in infos: continue
+        info=readHeaderInfo(picture)
+        if info is not None:
+            infos[picture]=read[picture]=info
+            continue
+        infos[picture]={"dateTimeSize":["nodate","notime",640,480],"lat":None,"lon":None,"ele":None}
+        names[outputName(picture)]=picture
+        remaining.append(picture)
+    if len(remaining)>0:
+        answer=runExiftool(["-json","-DateTimeOriginal","-ImageWidth","-ImageHeight",
+        "-GPSLatitude#","-GPSLatitudeRef#","-GPSLongitude#","-GPSLongitudeRef#",
+        "-GPSAltitude#","-GPSAltitudeRef#"]+remaining)
+        try:
+            records=json.loads(answer)
+        except ValueError:
+            # no picture could be read
+            records=[]
+    else:
+        records=[]
+    for record in records:
+        picture=names.get(outputName(record.get("SourceFile","")))
+        if picture is None: continue
+        info=read[picture]=infos[picture]
+        dateTime=str(record.get("DateTimeOriginal",""))
+        if len(dateTime)>=19:
+            info["dateTimeSize"][0:2]=[dateTime[0:10],dateTime[11:19]]
+        if "ImageWidth" in record and "ImageHeight" in record:
+            info["dateTimeSize"][2:4]=[str(record["ImageWidth"]),str(record["ImageHeight"])]
+        try:
+            lat=abs(float(record["GPSLatitude"]))
+            lon=abs(float(record["GPSLongitude"]))
+            if record.get("GPSLatitudeRef")=="S": lat=-lat
+            if record.get("GPSLongitudeRef")=="W": lon=-lon
+            info["lat"],info["lon"]=lat,lon
+            ele=float(record["GPSAltitude"])
+            if record.get("GPSAltitudeRef") in (1,"1"): ele=-ele
+            info["ele"]=ele
+        except (KeyError,ValueError,TypeError):
+            pass
+    if cache is not None and len(read)>0:
+        # not the pictures exiftool couldn't read, it may be missing
+        cache.put(read)
+    return infos
+
+cache=None
+cacheLock=threading.Lock()
+
+def sharedCache():
+    """
+    Returns the ExifCache shared by gpicsync, or None if USE_CACHE is
+    False or the cache can't be opened.
+    """
+    global cache
+    if not USE_CACHE:
+        return None
+    cacheLock.acquire()
+    try:
+        if cache is None:
+            try:
+                cache=ExifCache()
+            except (sqlite3.Error,OSError,IOError),e:
+                print "Couldn't open the EXIF cache %s: %s" % (CACHE_FILE,e)
+                cache=False
+    finally:
+        cacheLock.release()
+    return cache or None
+
+def forgetPictures(pictures):
+    """Removes pictures from the cache of the tags, after writing in them"""
+    cache=sharedCache()
+    if cache is not None:
+        cache.forget(pictures)
+
+def readHeaderInfo(picture):
+    """
+    Reads the Date/Time Original, size and GPS position of a picture without
+    exiftool (see exifheader.py) and returns them like readPicturesInfo,
+    or None if exiftool must be used: the file can't be read this way or
+    has no EXIF Date/Time Original (which exiftool may find elsewhere) or
+    image size (like the RAW files with an unknown layout).
+    """
+    try:
+        header=readExifHeader(picture)
+    except (IOError,OSError,ExifHeaderError):
+        return None
+    if header["DateTimeOriginal"] is None or header["width"] is None:
+        return None
+    dateTime=header["DateTimeOriginal"]
+    width,height=str(header["width"]),str(header["height"])
+    return {"dateTimeSize":[dateTime[0:10],dateTime[11:19],width,height],
+    "lat":header["lat"],"lon":header["lon"],"ele":header["ele"]}
+
+def outputName(picture):
+    """
+    Returns a picture path as exiftool writes it in its output (unicode,
+    with / separators) to find the picture of each exiftool record.
+    """
+    if not isinstance(picture,unicode):
+        picture=picture.decode(FILE_NAME_ENCODING,"replace")
+    return picture.replace("\\","/")
+
 if __name__=="__main__":
     
     mypicture=GeoExif("test.jpg")
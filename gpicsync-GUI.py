@@ -48,6 +48,7 @@ from PIL import JpegImagePlugin
 from PIL import GifImagePlugin
 
 from geoexif import *
+from sidecar import isRaw
 from gpx import *
 from gpicsync import *
 from kmlGen import *
@@ -104,6 +105,8 @@ class GUI(wx.Frame):
         self.defaultLat="0.000000"
         self.defaultLon="0.000000"
         self.geoname_IPTCsummary=""
+        self.workers=1
+        self.xmpSidecar=False
 
         if sys.platform in ("win32"):
             self.config_file = os.environ["USERPROFILE"]+"/"+CONF_FILENAME
@@ -422,6 +425,10 @@ class GUI(wx.Frame):
             self.picDir=conf.get("gpicsync","defaultdirectory")
         if conf.has_option("gpicsync","getimestamp") == True:
             self.timeStamp=eval(conf.get("gpicsync","getimestamp"))
+        if conf.has_option("gpicsync","workers") == True:
+            self.workers=int(conf.get("gpicsync","workers"))
+        if conf.has_option("gpicsync","xmp_sidecar") == True:
+            self.xmpSidecar=eval(conf.get("gpicsync","xmp_sidecar"))
 
     def writeConfFile(self):
         """Write the whole configuration file"""
@@ -466,6 +473,10 @@ class GUI(wx.Frame):
             fconf.write("#{LATITUDE} {LONGITUDE} {DISTANCETO} {NEARBYPLACE} {REGION} {COUNTRY} {ORIENTATION} \n")
             fconf.write("geoname_caption="+str(self.geoname_caption)+"\n")
             fconf.write("geoname_IPTCsummary="+str(self.geoname_IPTCsummary)+"\n\n")
+            fconf.write("#Number of processes reading the GPX files in parallel when several are selected\n")
+            fconf.write("workers="+str(self.workers)+"\n\n")
+            fconf.write("#Write the positions of the RAW pictures in .xmp sidecar files instead of the RAW files (True or False)\n")
+            fconf.write("xmp_sidecar="+str(self.xmpSidecar)+"\n\n")
             fconf.write("#Set default or last directory automatically used\n")
             fconf.write("Defaultdirectory="+self.picDir)
             fconf.write("")
@@ -611,25 +622,15 @@ class GUI(wx.Frame):
         wx.CallAfter(self.consolePrint,"\n---\n")
         def writeEXIF(latitude,longitude,latRef,longRef):
             if len(self.pathPictures)!=0:
+                writer=GpsWriter(xmpSidecar=self.xmpSidecar)
                 for pic in self.pathPictures:
                     wx.CallAfter(self.consolePrint,_("Writing GPS latitude/longitude ")+\
                     latRef+latitude+" / "+longRef+longitude+" ---> "+os.path.basename(pic)+"\n")
-                    if elevation!="":
-                        eleExif= " -GPSAltitude="+elevation+" -GPSAltitudeRef=0 "
-                    else: eleExif=""
-
-                    """
-                    order='%s -n "-DateTimeOriginal>FileModifyDate" \
-                     -GPSLatitude=%s -GPSLongitude=%s %s\
-                     -GPSLatitudeRef=%s -GPSLongitudeRef=%s "%s" '\
-                    %(self.exifcmd,latitude,longitude,eleExif, latRef,longRef,pic)
-                    print order
-                    """
-
-                    os.popen('%s -n "-DateTimeOriginal>FileModifyDate" \
-                     -GPSLatitude=%s -GPSLongitude=%s %s\
-                     -GPSLatitudeRef=%s -GPSLongitudeRef=%s "%s" '\
-                    %(self.exifcmd,latitude,longitude,eleExif, latRef,longRef,pic))
+                    writer.add(pic,latitude,longitude,latRef,longRef,elevation or "None")
+                for pic,written in writer.write():
+                    if not written:
+                        wx.CallAfter(self.consolePrint,_("Couldn't write the position in ")+\
+                        os.path.basename(pic)+"\n")
                 wx.CallAfter(self.consolePrint,"---"+_("Finished")+"---\n")
         try:
             if float(latitude)>0:
@@ -709,7 +710,7 @@ class GUI(wx.Frame):
 
     def findGpx(self,evt):
         """
-        Select the .gpx file to use or create one if necessary through GPSbabel
+        Select the .gpx files (or NMEA .txt logs, Garmin .fit/.tcx files) to use
         """
         if sys.platform == 'win32':
             openGpx=wx.FileDialog(self,style=wx.FD_MULTIPLE)
@@ -719,7 +720,13 @@ class GUI(wx.Frame):
             else:
                 if sys.platform == 'darwin':
                      openGpx=wx.FileDialog(self)
-        openGpx.SetWildcard("GPX Files(*.gpx)|*.gpx|NMEA Files (*.txt)|*.txt")
+        # the compressed files which can be read (.xz only with lzma)
+        def patterns(extensions):
+            return ";".join(["*"+extension+compression for compression in [""]+sorted(COMPRESSIONS)
+            for extension in extensions])
+        openGpx.SetWildcard("GPX Files(*.gpx)|"+patterns([".gpx"])+"|"+\
+        "NMEA Files (*.txt;*.nmea)|"+patterns([".txt",".nmea"])+"|"+\
+        "Garmin Files (*.fit;*.tcx)|"+patterns([".fit",".tcx"]))
         openGpx.ShowModal()
         if sys.platform == 'win32':
             self.gpxFile=openGpx.GetPaths()
@@ -729,26 +736,6 @@ class GUI(wx.Frame):
             else:
                 if sys.platform == 'darwin':
                      self.gpxFile=[openGpx.GetPath()]
-        j=0
-        for track in self.gpxFile:
-            if os.path.basename(self.gpxFile[j]).find(".txt")>0 or\
-            os.path.basename(self.gpxFile[j]).find(".TXT")>0:
-                try:
-                    target=self.gpxFile[j].split(".txt")[0]+".gpx"
-                    babelResult=os.popen('gpsbabel -i nmea -f "%s" -o gpx -F "%s"' \
-                    % (self.gpxFile[j],target)).read()
-                    #print babelResult
-                    self.gpxFile[j]=target
-                    j+=1
-                    if os.path.isfile(target)==True:
-                        wx.CallAfter(self.consolePrint,\
-                        _("For information, GPX file created with GPSBabel in your picture folder."))
-                    else:
-                        wx.CallAfter(self.consolePrint,_("Possible problem with the creation of the gpx file"))
-
-                except:
-                    wx.CallAfter(self.consolePrint,_("Couldn't create the necessary GPX file."))
-
         gpxPaths=""
         i=0
         for path in self.gpxFile:
@@ -797,7 +784,7 @@ class GUI(wx.Frame):
                 pass
             geo=GpicSync(gpxFile=self.gpxFile,tcam_l=self.tcam_l,tgps_l=self.tgps_l,timezone=self.timezone,
             UTCoffset=self.utcOffset,dateProcess=dateProcess,timerange=int(self.timerangeEntry.GetValue()),
-            backup=False,interpolation=self.interpolation)
+            backup=False,interpolation=self.interpolation,workers=self.workers,xmpSidecar=self.xmpSidecar)
 
             if self.backupCheck.GetValue()==True:
                 backupFolder=self.picDir+'/originals-backup-'+os.path.basename(self.picDir)+'/'
@@ -833,6 +820,8 @@ class GUI(wx.Frame):
                 f.write(_("Pictures Folder: ")+self.picDir+"\n")
                 f.write(_("GPX file: ")+self.gpxEntry.GetValue()+"\n\n")
 
+            fileNames=[]
+            backupFolder=self.picDir+'/originals-backup-'+os.path.basename(self.picDir)+'/'
             for fileName in os.listdir ( self.picDir ):
                 if self.stop==True: break
                 if fnmatch.fnmatch ( fileName, '*.JPG' )\
@@ -855,149 +844,177 @@ class GUI(wx.Frame):
                 or fnmatch.fnmatch ( fileName, '*.raf' )\
                 or fnmatch.fnmatch ( fileName, '*.MRW' )\
                 or fnmatch.fnmatch ( fileName, '*.mrw' ):
-
-                    print "\nFound fileName ",fileName," Processing now ..."
-                    wx.CallAfter(self.consolePrint,"\n"+_("(Found ")+fileName+" ...")
-                    print self.picDir+'/'+fileName
-
-                    backupFolder=self.picDir+'/originals-backup-'+os.path.basename(self.picDir)+'/'
-
+                    fileNames.append(fileName)
+                    # backup before syncPictures starts writing the pictures
+                    # (the RAW pictures aren't written in sidecar mode)
                     if self.backupCheck.GetValue()==True\
+                    and not (self.xmpSidecar and isRaw(fileName))\
                     and os.path.isfile(backupFolder+fileName)==False:
                         shutil.copyfile(self.picDir+'/'+fileName,backupFolder+fileName)
 
-                    #Create thumb and make a preview
-                    if fnmatch.fnmatch (fileName, '*.JPG') or fnmatch.fnmatch (fileName, '*.jpg'):
-                        print "Create a thumb now!"
-                        try:
-                            im=Image.open(self.picDir+'/'+fileName)
-                            width=int(im.size[0])
-                            height=int(im.size[1])
-                            if width>height:
-                                max=width
-                            else:
-                                max=height
-                            zoom=float(160.0/max)
-                            im.thumbnail((int(width*zoom),int(height*zoom)))
-                            im.save(self.picDir+"/thumbs/"+"thumb_"+fileName)
-                            wx.CallAfter(self.imagePreview,self.picDir+"/thumbs/"+"thumb_"+fileName)
-                        except:
-                            print "Warning: didn't create thumbnail, no JPG file ?"
-
-                    result=geo.syncPicture(self.picDir+'/'+fileName)
-                    wx.CallAfter(self.consolePrint,result[0]+"\n")
-
-                    #Check if the picture have Date/Time infos, otherwise go to next pic.
-                    if result[0]==" : WARNING: DIDN'T GEOCODE, no Date/Time Original in this picture.":
-                        continue
-
-                    if self.log==True:
-                        f.write(_("Processed image ")+fileName+" : "+result[0]+"\n")
-
-                    if self.geCheck.GetValue()==True and result[1] !="" and result[2] !="":
-                        localKml.placemark(self.picDir+'/'+fileName,lat=result[1],
-                        long=result[2],width=result[3],height=result[4],timeStamp=result[5],
-                        elevation=result[6])
-
-                    if self.gmCheck.GetValue()==True and result[1] !="" and result[2] !="":
-                        webKml.placemark4Gmaps(self.picDir+'/'+fileName,lat=result[1],long=result[2],width=result[3],height=result[4],elevation=result[6])
-
-                    if self.geonamesCheck.GetValue()==True and result[1] !="" and result[2] !="": # checks if geonames checked and lat/lon exist
-                        try:
-                            nearby=Geonames(lat=result[1],long=result[2])
-                        except:
-                            wx.CallAfter(self.consolePrint,_("Couldn't retrieve geonames data...")+"\n")
-                        try:
-                            if self.geoname_nearbyplace==True:
-                                gnPlace=nearby.findNearbyPlace()
-                            else: gnPlace=""
-                        except:
-                            gnPlace=""
-                        try:
-                            gnDistance=nearby.findDistance()
-                        except:
-                            gnDistance=""
-                        try:
-                            if self.geoname_region==True:
-                                gnRegion=nearby.findRegion()
-                            else: gnRegion=""
-                        except:
-                            gnRegion=""
-                        try:
-                            if self.geoname_country==True:
-                                gnCountry=nearby.findCountry()
-                            else: gnCountry=""
-                        except:
-                            gnCountry=""
-                        try:
-                            if self.geoname_userdefine !="":
-                                userdefine=self.geoname_userdefine
-                            else: userdefine=""
-                        except:
-                            userdefine=""
-                        try:
-                            gnCountryCode=nearby.findCountryCode()
-                        except:
-                            gnCountryCode=""
-                            print "!!! Something went wrong while retreiving country code !!!"
-                        try:
-                            gnOrientation=nearby.findOrientation()
-                        except:
-                            gnOrientation=""
-                            print "!!! Something went wrong while retreiving orientation !!!"
-                        #try:
+            if self.stop==True:
+                # stopped while listing the folder: no picture is written
+                wx.CallAfter(self.consolePrint,"\n *** "+_("PROCESSING STOPPED BY THE USER")+" ***\n")
+                if self.log==True: f.close()
+                if self.geCheck.GetValue()==True:
+                    localKml.writeInKml("</Folder>\n")
+                    localKml.close()
+                if self.gmCheck.GetValue()==True:
+                    webKml.writeInKml("</Folder>\n")
+                    webKml.close()
+                return
+
+            gnMessages={} # geonames infos to show, by picture
+            def geonamesTags(result):
+                """Returns the exiftool arguments writing the geonames of a geocoded SyncResult"""
+                try:
+                    nearby=Geonames(lat=result.latitude,long=result.longitude)
+                except:
+                    wx.CallAfter(self.consolePrint,_("Couldn't retrieve geonames data...")+"\n")
+                try:
+                    if self.geoname_nearbyplace==True:
+                        gnPlace=nearby.findNearbyPlace()
+                    else: gnPlace=""
+                except:
+                    gnPlace=""
+                try:
+                    gnDistance=nearby.findDistance()
+                except:
+                    gnDistance=""
+                try:
+                    if self.geoname_region==True:
+                        gnRegion=nearby.findRegion()
+                    else: gnRegion=""
+                except:
+                    gnRegion=""
+                try:
+                    if self.geoname_country==True:
+                        gnCountry=nearby.findCountry()
+                    else: gnCountry=""
+                except:
+                    gnCountry=""
+                try:
+                    if self.geoname_userdefine !="":
+                        userdefine=self.geoname_userdefine
+                    else: userdefine=""
+                except:
+                    userdefine=""
+                try:
+                    gnCountryCode=nearby.findCountryCode()
+                except:
+                    gnCountryCode=""
+                    print "!!! Something went wrong while retreiving country code !!!"
+                try:
+                    gnOrientation=nearby.findOrientation()
+                except:
+                    gnOrientation=""
+                    print "!!! Something went wrong while retreiving orientation !!!"
+                #try:
+                if 1:
+                    if self.geoname_summary==True:
+                        gnSummary=gnDistance+"  Km to "+gnPlace+"  in "+gnRegion+" "+gnCountry
+                    else:
+                        gnSummary=""
+                    gnInfos="Geonames: "+gnDistance+" Km "+gnOrientation +" "+ gnPlace+" "+gnRegion+" "+gnCountry+" "+gnCountryCode
+                    print "gnInfos:",gnInfos
+                    geotag="geotagged"
+                    tempLat=str(decimal.Decimal(result.latitude).quantize(decimal.Decimal('0.000001')))
+                    tempLong=str(decimal.Decimal(result.longitude).quantize(decimal.Decimal('0.000001')))
+                    geotagLat="geo:lat="+tempLat
+                    geotagLon="geo:lon="+tempLong
+                    gnMessages[result.picture]=gnInfos+_(", writing geonames)")+"\n"
+
+                    geonameKeywords=[] # create initial geonames exiftool arguments
+                    gnIPTCsummary=[]
+
+                    print userdefine
+                    if self.gnOptChoice.GetSelection() in [2,3]:
+                        for geoname in [gnPlace,gnRegion,gnCountry,gnSummary,geotag,geotagLat,geotagLon,userdefine]:
+                            if geoname !="":
+                                geonameKeywords.append('-keywords=%s' % geoname)
+
+                    if self.geoname_caption==True:
+                        gnIPTCsummary= self.geoname_IPTCsummary
+                        for var in [("{LATITUDE}",tempLat),("{LONGITUDE}",tempLong),
+                        ("{DISTANCETO}",gnDistance),("{NEARBYPLACE}",gnPlace),
+                        ("{REGION}",gnRegion),("{COUNTRY}",gnCountry),("{ORIENTATION}",gnOrientation)]:
+                            gnIPTCsummary=gnIPTCsummary.replace(var[0],var[1])
+                        gnIPTCsummary=['-iptc:caption-abstract='+gnIPTCsummary]
+                        print "=== gnIPTCsummary=== ",gnIPTCsummary, "======"
+
+                    if self.gnOptChoice.GetSelection() in [0,1]:
+                        if gnPlace !="": geonameKeywords.append('-iptc:city='+gnPlace)
+                        if gnRegion !="": geonameKeywords.append('-iptc:province-state='+gnRegion)
+                        if gnCountry !="": geonameKeywords.append('-iptc:Country-PrimaryLocationName='+gnCountry)
+                        print "*************",gnCountryCode,type(gnCountryCode)
+                        if gnCountryCode !="": geonameKeywords.append('-iptc:Country-PrimaryLocationCode='+gnCountryCode)
                         if 1:
-                            if self.geoname_summary==True:
-                                gnSummary=gnDistance+"  Km to "+gnPlace+"  in "+gnRegion+" "+gnCountry
-                            else:
-                                gnSummary=""
-                            gnInfos="Geonames: "+gnDistance+" Km "+gnOrientation +" "+ gnPlace+" "+gnRegion+" "+gnCountry+" "+gnCountryCode
-                            print "gnInfos:",gnInfos
-                            geotag="geotagged"
-                            tempLat=str(decimal.Decimal(result[1]).quantize(decimal.Decimal('0.000001')))
-                            tempLong=str(decimal.Decimal(result[2]).quantize(decimal.Decimal('0.000001')))
-                            geotagLat="geo:lat="+tempLat
-                            geotagLon="geo:lon="+tempLong
-                            wx.CallAfter(self.consolePrint,gnInfos+_(", writing geonames)")+"\n")
-
-                            geonameKeywords="" # create initial geonames string command
-
-                            print userdefine
-                            if self.gnOptChoice.GetSelection() in [2,3]:
-                                for geoname in [gnPlace,gnRegion,gnCountry,gnSummary,geotag,geotagLat,geotagLon,userdefine]:
-                                    if geoname !="":
-                                        geonameKeywords+=' -keywords="%s" ' % geoname
-
-                            if self.geoname_caption==True:
-                                gnIPTCsummary= self.geoname_IPTCsummary
-                                for var in [("{LATITUDE}",tempLat),("{LONGITUDE}",tempLong),
-                                ("{DISTANCETO}",gnDistance),("{NEARBYPLACE}",gnPlace),
-                                ("{REGION}",gnRegion),("{COUNTRY}",gnCountry),("{ORIENTATION}",gnOrientation)]:
-                                    gnIPTCsummary=gnIPTCsummary.replace(var[0],var[1])
-                                gnIPTCsummary=' -iptc:caption-abstract="'+gnIPTCsummary+'"'
-                                print "=== gnIPTCsummary=== ",gnIPTCsummary, "======"
-
-                            if self.gnOptChoice.GetSelection() in [0,1]:
-                                if gnPlace !="": geonameKeywords+=' -iptc:city="'+gnPlace+'"'
-                                if gnRegion !="": geonameKeywords+=' -iptc:province-state="'+gnRegion+'"'
-                                if gnCountry !="": geonameKeywords+=' -iptc:Country-PrimaryLocationName="'+gnCountry+'"'
-                                print "*************",gnCountryCode,type(gnCountryCode)
-                                if gnCountryCode !="": geonameKeywords+=' -iptc:Country-PrimaryLocationCode="'+gnCountryCode+'"'
-                                if 1:
-                                    geonameKeywords+=' -iptc:Sub-location="'+gnDistance+" Km "+gnOrientation+" "+gnPlace+'"'
-                                #if gnPlace !="": geonameKeywords+=' -iptc:city="'+gnPlace+'"'
-
-                            if self.gnOptChoice.GetSelection() in [0,2]:
-                                geonameKeywords+=gnIPTCsummary
-
-                            print "\n=== geonameKeywords ===\n", geonameKeywords,"\n======"
-                            # WRITE GEONAMES
-                            os.popen('%s %s  -overwrite_original "-DateTimeOriginal>FileModifyDate" "%s" '%(self.exifcmd,geonameKeywords,self.picDir+'/'+fileName))
-
-                        #except:
-                        if 0:
-                            print "Had problem when writing geonames"
-                            traceback.print_exc(file=sys.stdout)
+                            geonameKeywords.append('-iptc:Sub-location='+gnDistance+" Km "+gnOrientation+" "+gnPlace)
+                        #if gnPlace !="": geonameKeywords+=' -iptc:city="'+gnPlace+'"'
+
+                    if self.gnOptChoice.GetSelection() in [0,2]:
+                        geonameKeywords+=gnIPTCsummary
+
+                    print "\n=== geonameKeywords ===\n", geonameKeywords,"\n======"
+                    # written with the position (see GpicSync.syncPictures)
+                    return geonameKeywords
+
+                #except:
+                if 0:
+                    print "Had problem when writing geonames"
+                    traceback.print_exc(file=sys.stdout)
+
+            # the pictures are geocoded in the order they were taken, the
+            # Stop button is checked between pictures and the pictures
+            # already written are still shown
+            if self.geonamesCheck.GetValue()==True:
+                moreTags=geonamesTags
+            else:
+                moreTags=None
+            for picture,result in geo.syncPictures([self.picDir+'/'+fileName for fileName in fileNames],
+            moreTags,lambda:self.stop):
+                fileName=os.path.basename(picture)
+                print "\nFound fileName ",fileName," Processing now ..."
+                wx.CallAfter(self.consolePrint,"\n"+_("(Found ")+fileName+" ...")
+                print self.picDir+'/'+fileName
+
+                #Create thumb and make a preview
+                if fnmatch.fnmatch (fileName, '*.JPG') or fnmatch.fnmatch (fileName, '*.jpg'):
+                    print "Create a thumb now!"
+                    try:
+                        im=Image.open(self.picDir+'/'+fileName)
+                        width=int(im.size[0])
+                        height=int(im.size[1])
+                        if width>height:
+                            max=width
+                        else:
+                            max=height
+                        zoom=float(160.0/max)
+                        im.thumbnail((int(width*zoom),int(height*zoom)))
+                        im.save(self.picDir+"/thumbs/"+"thumb_"+fileName)
+                        wx.CallAfter(self.imagePreview,self.picDir+"/thumbs/"+"thumb_"+fileName)
+                    except:
+                        print "Warning: didn't create thumbnail, no JPG file ?"
+
+                wx.CallAfter(self.consolePrint,result[0]+"\n")
+
+                #Check if the picture have Date/Time infos, otherwise go to next pic.
+                if result[0]==" : WARNING: DIDN'T GEOCODE, no Date/Time Original in this picture.":
+                    continue
+
+                if self.log==True:
+                    f.write(_("Processed image ")+fileName+" : "+result[0]+"\n")
+
+                if self.geCheck.GetValue()==True and result[1] !="" and result[2] !="":
+                    localKml.placemark(self.picDir+'/'+fileName,lat=result[1],
+                    long=result[2],width=result[3],height=result[4],timeStamp=result[5],
+                    elevation=result[6])
+
+                if self.gmCheck.GetValue()==True and result[1] !="" and result[2] !="":
+                    webKml.placemark4Gmaps(self.picDir+'/'+fileName,lat=result[1],long=result[2],width=result[3],height=result[4],elevation=result[6])
+
+                if self.geonamesCheck.GetValue()==True and picture in gnMessages:
+                    wx.CallAfter(self.consolePrint,gnMessages.pop(picture))
 
             if self.stop==False:
                 wx.CallAfter(self.consolePrint,"\n*** "+_("FINISHED GEOCODING PROCESS")+" ***\n")
@@ -1178,6 +1195,7 @@ class GUI(wx.Frame):
                     wx.CallAfter(self.consolePrint,"\n"+_("Didn't find Original Time/Date for ")+self.pathPicture)
                 else:
                     os.rename(self.pathPicture,os.path.dirname(self.pathPicture)+"/"+string+" "+latlong+".jpg")
+                    forgetPictures([self.pathPicture])
                     wx.CallAfter(self.consolePrint,"\n"+_("Renamed ")+os.path.basename(self.pathPicture)+" -> "+string+latlong+".jpg")
             start_new_thread(rename,())
 
@@ -1209,6 +1227,7 @@ class GUI(wx.Frame):
                             if latlong==None: latlong=""
                             print "latlong= ",latlong
                             os.rename(self.picDir+'/'+fileName,self.picDir+"/"+string+" "+latlong+".jpg")
+                            forgetPictures([self.picDir+'/'+fileName])
                             wx.CallAfter(self.consolePrint,"\n"+_("Renamed ")+fileName+" to "+string+" "+latlong+".jpg")
                 wx.CallAfter(self.consolePrint,"\n"+_("Finished"))
             start_new_thread(rename,())
@@ -1287,15 +1306,16 @@ class GUI(wx.Frame):
             wx.CallAfter(self.consolePrint,"\n"+_("Select a gpx file first."))
         else:
             gpxPath=[gpxPath]
-            myGpx=Gpx(gpxPath).extract()
+            track=Gpx(gpxPath).track
             wx.CallAfter(self.consolePrint,"\n"+_("Looking at ")+gpxPath[0]+"\n")
-            wx.CallAfter(self.consolePrint,"\n"+_("Number of valid track points found")+" : "+str(len(myGpx))+"\n\n")
+            wx.CallAfter(self.consolePrint,"\n"+_("Number of valid track points found")+" : "+str(len(track))+"\n\n")
             def inspect():
-                for trkpt in myGpx:
-                    wx.CallAfter(self.consolePrint,_("Date")+": "+trkpt["date"]+"\t"+_("Time")+": "\
-                    +trkpt["time"]+"\t"+_("Latitude")+": "+trkpt["lat"]
-                    +"\t"+_("Longitude")+": "+trkpt["lon"]
-                    +"\t"+_("Altitude")+": "+trkpt["ele"]+"\n")
+                for i in xrange(len(track)):
+                    date,hour=track.dateTime(i)
+                    wx.CallAfter(self.consolePrint,_("Date")+": "+date+"\t"+_("Time")+": "\
+                    +hour+"\t"+_("Latitude")+": "+formatCoordinate(track.lats[i])
+                    +"\t"+_("Longitude")+": "+formatCoordinate(track.lons[i])
+                    +"\t"+_("Altitude")+": "+formatElevation(track.eles[i])+"\n")
             start_new_thread(inspect,())
 
     def tzMenuPopup(self, evt):
@@ -1315,7 +1335,11 @@ class GUI(wx.Frame):
         self.utcLabel.Disable()
         self.utcEntry.Disable()
 
-app=wx.App(redirect=False)
-win=GUI(None,title="GPicSync GUI")
-win.Show()
-app.MainLoop()
+if __name__=="__main__":
+    # needed by the processes reading the gpx files on Windows
+    import multiprocessing
+    multiprocessing.freeze_support()
+    app=wx.App(redirect=False)
+    win=GUI(None,title="GPicSync GUI")
+    win.Show()
+    app.MainLoop()
@@ -28,41 +28,275 @@ python gpicsync.py -d myfoderWithPictures -g myGpxFile.gpx -o UTCoffset
 For more options type gpicsync.py --help
 """
 
-import gettext,time,datetime
+import gettext,time,datetime,calendar
 try: import pytz
 except ImportError: pass
 
 from geoexif import *
 from gpx import *
+from library import TrackLibrary
+from plan import *
 
 
+MAX_DELTA=864000 # no trackpoint is searched more than 10 days from a picture
+
+class SyncResult(object):
+    """
+    The geocoding of a picture by a Matcher:
+    'picture': the picture path
+    'date', 'time': its Date/Time Original like '2007-02-12' and '16:09:10'
+    ('nodate' and 'notime' if it has none)
+    'width', 'height': its size
+    'picTime': its UTC epoch seconds, None without Date/Time Original
+    'latitude', 'longitude', 'elevation': strings, "" if no trackpoint was
+    found within MAX_DELTA
+    'latRef', 'longRef': 'N' or 'S' and 'E' or 'W'
+    'delta': seconds to the nearest trackpoint, None if the track is empty
+    'geocoded': True if the delta is below the time range, the position
+    can be written in the picture
+    """
+    def __init__(self,picture,picDateTimeSize,picTime=None,position=None,timerange=3600):
+        """position: (lat,lon,ele,delta) of the picture on the track"""
+        self.picture=picture
+        self.date=picDateTimeSize[0].replace(":","-")
+        self.time=picDateTimeSize[1]
+        self.width=picDateTimeSize[2]
+        self.height=picDateTimeSize[3]
+        self.picTime=picTime
+        self.timerange=timerange
+        self.latitude=""
+        self.longitude=""
+        self.elevation=""
+        self.latRef=""
+        self.longRef=""
+        self.delta=None
+        if position is not None:
+            lat,lon,ele,self.delta=position
+            if self.delta<MAX_DELTA:
+                self.latitude=formatCoordinate(lat)
+                self.longitude=formatCoordinate(lon)
+                self.elevation=formatElevation(ele)
+                if lat>0:self.latRef="N"
+                else: self.latRef="S"
+                if lon>0:self.longRef="E"
+                else: self.longRef="W"
+        self.geocoded=self.latitude!="" and self.delta<timerange
+
+    def asList(self):
+        """
+        Returns the result as the list returned by GpicSync.syncPicture:
+        [response,latitude,longitude,width,height,timeStamp,elevation]
+        (shorter when the picture isn't geocoded).
+        """
+        shotDateTime=self.date+"-"+self.time
+        if self.picTime is None:
+            return [" : WARNING: DIDN'T GEOCODE, no Date/Time Original in this picture.",
+            ""]
+        if self.delta is None:
+            return [_(" : WARNING: DIDN'T GEOCODE, ")+_("no track points found - ")\
+                     +shotDateTime,"","",self.width,self.height,self.elevation]
+        if self.geocoded:
+            return [ _("taken ")+shotDateTime+", "\
+            +_("writing best latitude/longitude match to picture: ")+self.latRef+\
+            " "+self.latitude+" ,"+self.longRef+" "+self.longitude+" :"+_(" time difference (s)= ")+str(int(self.delta)),
+            self.latitude,self.longitude,self.width,self.height,self.date+"T"+self.time,self.elevation]
+        delta=min(self.delta,MAX_DELTA)
+        if delta !=86400:
+            return [_(" : WARNING: DIDN'T GEOCODE, ")+_("no track point below the maximum time range ")\
+            +"( "+str(self.timerange)+" s) : " +shotDateTime+_(" time difference (s)= ")+str(int(delta))\
+            +"\n"+_("For information nearest trackpoint was at lat=")+self.latitude+_(" long=")+self.longitude,
+            "","",self.width,self.height,self.elevation]
+        else:
+            return [_(" : WARNING: DIDN'T GEOCODE, ")+_("no track point at this picture date ")\
+             +shotDateTime,"","",self.width,self.height,self.elevation]
+
+class Matcher(object):
+    """
+    The track and the time settings used to geocode pictures.
+    A Matcher isn't modified once created (copy returns a modified copy)
+    and matching pictures doesn't write anything, so a single Matcher can
+    be shared by several threads, or sent to worker processes, to geocode
+    pictures against the same track.
+    """
+    def __init__(self,track,localOffset=0,timezone=None,timerange=3600,interpolation=False):
+        """
+        track: a sorted Track
+        localOffset: seconds to subtract from the camera times to get UTC
+        timezone: pytz time zone of the camera times, or None
+        timerange: maximum seconds between a picture and the trackpoint
+        interpolation: interpolate the position between two trackpoints
+        """
+        self.track=track
+        self.localOffset=localOffset
+        self.timezone=timezone
+        self.timerange=timerange
+        self.interpolation=interpolation
+
+    def copy(self,**changes):
+        """Returns a copy of the Matcher with the given attributes changed"""
+        settings={"track":self.track,"localOffset":self.localOffset,"timezone":self.timezone,
+        "timerange":self.timerange,"interpolation":self.interpolation}
+        settings.update(changes)
+        return Matcher(**settings)
+
+    def pictureTime(self,date,time):
+        """
+        Returns the UTC time in epoch seconds of a picture taken at the given
+        camera date and time (EXIF strings like '2007:02:12' and '16:09:10'),
+        corrected with the camera/GPS offset and the UTC offset or time zone.
+        Raises ValueError for an impossible date like '0000:00:00' (written
+        by the cameras whose clock was never set).
+        """
+        t=(date+":"+time).split(":")
+        picTime=calendar.timegm((int(t[0]),int(t[1]),int(t[2]),
+        int(t[3]),int(t[4]),int(t[5])))-self.localOffset
+        if self.timezone:
+            offset=self.timezone.localize(datetime.datetime.utcfromtimestamp(picTime)).utcoffset()
+            picTime-=offset.days*86400+offset.seconds
+        return picTime
+
+    def match(self,pictures):
+        """
+        Geocodes the pictures given as a list of (picture,picDateTimeSize),
+        picDateTimeSize being the list of GeoExif.readDateTimeSize, and
+        returns a list of SyncResult in the same order. All the positions
+        are computed in one go (see Track.locate).
+        """
+        results=[None]*len(pictures)
+        dated=[]
+        for i,(picture,picDateTimeSize) in enumerate(pictures):
+            if picDateTimeSize[0]=="nodate":
+                results[i]=SyncResult(picture,picDateTimeSize)
+                continue
+            try:
+                picTime=self.pictureTime(picDateTimeSize[0],picDateTimeSize[1])
+            except ValueError:
+                # like a picture without Date/Time Original
+                results[i]=SyncResult(picture,picDateTimeSize)
+                continue
+            dated.append((i,picture,picDateTimeSize,picTime))
+        if len(self.track)==0:
+            for i,picture,picDateTimeSize,picTime in dated:
+                results[i]=SyncResult(picture,picDateTimeSize,picTime,None,self.timerange)
+        elif len(dated)>0:
+            lats,lons,eles,deltas,found=self.track.locate([picTime
+            for i,picture,picDateTimeSize,picTime in dated],self.timerange,self.interpolation)
+            for k,(i,picture,picDateTimeSize,picTime) in enumerate(dated):
+                position=(float(lats[k]),float(lons[k]),float(eles[k]),int(deltas[k]))
+                results[i]=SyncResult(picture,picDateTimeSize,picTime,position,self.timerange)
+        return results
+
 class GpicSync(object):
     """
     A class to manage the geolocalisation from a .gpx file.
+    The track and time settings are kept in a Matcher (self.matcher), the
+    GpicSync reads the pictures and writes the positions found in them.
     """
     def __init__(self,gpxFile,tcam_l="00:00:00",tgps_l="00:00:00",UTCoffset=0,timezone=None,
-    dateProcess=True,timerange=3600,backup=True,interpolation=False):
-        """Extracts data from the gpx file and compute local offset duration"""
-        myGpx=Gpx(gpxFile)
-        self.track=myGpx.extract()
-        #print self.track
-        self.localOffset=0 #default time offset between camera and GPS
+    dateProcess=True,timerange=3600,backup=True,interpolation=False,workers=1,pictures=None,
+    library=None,xmpSidecar=False):
+        """
+        Extracts data from the gpx file and compute local offset duration
+        workers: number of processes used to read the gpx files
+        pictures: if a list of pictures is given, only the track points
+        around the time these pictures were taken (+/- timerange) are loaded
+        library: a TrackLibrary (see library.py) giving the gps files to
+        read in addition to gpxFile: the files covering the time of the
+        pictures, or all its files if no pictures are given
+        xmpSidecar: write the positions of the RAW pictures in .xmp sidecar
+        files instead of the pictures (see sidecar.py)
+        """
         self.dateCheck=dateProcess
         self.UTCoffset=UTCoffset*3600
         tcam_l=int(tcam_l[0:2])*3600+int(tcam_l[3:5])*60+int(tcam_l[6:8])
         tgps_l=int(tgps_l[0:2])*3600+int(tgps_l[3:5])*60+int(tgps_l[6:8])
-        self.timerange=timerange
         if timezone is not None:
-            self.timezone = pytz.timezone(timezone)
+            timezone = pytz.timezone(timezone)
             self.UTCoffset = 0
-        else:
-            self.timezone = None
-        self.localOffset=tcam_l - tgps_l + self.UTCoffset
+        localOffset=int(tcam_l - tgps_l + self.UTCoffset)
         self.backup=backup
-        self.interpolation=interpolation
+        self.xmpSidecar=xmpSidecar
+        # without track until it is loaded, pictureTime is needed before
+        self.matcher=Matcher(Track(),localOffset,timezone,timerange,interpolation)
         print "local UTC Offset (seconds)= ", self.localOffset
+        window=None
+        if pictures is not None:
+            window=self.picturesWindow(pictures)
+        if library is not None:
+            if window is not None: libraryFiles=library.files(*window)
+            else: libraryFiles=library.files()
+            print "Using",len(libraryFiles),"gps files of the track library"
+            gpxFile=list(gpxFile or [])+[f for f in libraryFiles if f not in (gpxFile or [])]
+        myGpx=Gpx(gpxFile,workers=workers,window=window)
+        self.matcher=self.matcher.copy(track=myGpx.track)
         #print self.track
 
+    # the settings of the matcher
+    track=property(lambda self:self.matcher.track)
+    timezone=property(lambda self:self.matcher.timezone)
+    timerange=property(lambda self:self.matcher.timerange)
+    interpolation=property(lambda self:self.matcher.interpolation)
+
+    def setLocalOffset(self,localOffset):
+        self.matcher=self.matcher.copy(localOffset=localOffset)
+
+    localOffset=property(lambda self:self.matcher.localOffset,setLocalOffset,
+    doc="Seconds to subtract from the camera times to get UTC")
+
+    def picturesWindow(self,pictures):
+        """
+        Returns the (start,end) UTC epoch seconds of the track needed to
+        geocode the given pictures: from the first picture time minus the
+        time range to the last one plus the time range.
+        Returns None if no picture has a Date/Time Original.
+        """
+        picTimes=self.picturesTimes(pictures)
+        if len(picTimes)==0:
+            return None
+        print "Loading the track points from",time.strftime("%Y-%m-%d %H:%M:%S",time.gmtime(min(picTimes))),\
+        "to",time.strftime("%Y-%m-%d %H:%M:%S",time.gmtime(max(picTimes))),"UTC (+/-",self.timerange,"s)"
+        return (min(picTimes)-self.timerange,max(picTimes)+self.timerange)
+
+    def picturesTimes(self,pictures):
+        """
+        Returns the list of the UTC epoch seconds of the pictures having a
+        valid Date/Time Original (see pictureTime), read with a single
+        exiftool command.
+        """
+        picTimes=[]
+        for info in readPicturesInfo(pictures).values():
+            picDateTimeSize=info["dateTimeSize"]
+            if picDateTimeSize[0]!="nodate":
+                try:
+                    picTimes.append(self.pictureTime(picDateTimeSize[0],picDateTimeSize[1]))
+                except ValueError:
+                    pass
+        return picTimes
+
+    def estimateOffset(self,picTimes,anchors=None,maxOffset=43200,step=60):
+        """
+        Estimates the error of the camera clock when it wasn't synchronized
+        with the GPS, from the pictures UTC epoch seconds 'picTimes' (see
+        picturesTimes): tries the offsets from -maxOffset to maxOffset
+        seconds every 'step' seconds, then every second around the best one
+        (see Track.estimateOffset).
+        anchors: optional list of (picTime,lat,lon) of pictures with a known
+        position (decimal degrees)
+        Returns a tuple (offset,count): the seconds the camera was ahead of
+        the GPS, to add to the local offset, and the number of pictures
+        within the time range with this offset.
+        """
+        if len(self.track)==0 or len(picTimes)==0:
+            return 0,0
+        offsets=range(-maxOffset,maxOffset+1,step)
+        offset,count=self.track.estimateOffset(picTimes,offsets,self.timerange,anchors)
+        offsets=range(offset-step,offset+step+1)
+        return self.track.estimateOffset(picTimes,offsets,self.timerange,anchors)
+
+    def pictureTime(self,date,time):
+        """See Matcher.pictureTime"""
+        return self.matcher.pictureTime(date,time)
+
     def syncPicture(self,picture):
         """
         Find the nearest trackpoint from the recorded time in the picture.
@@ -70,104 +304,82 @@ class GpicSync(object):
         where 'response' is the general reslult to be show to the user
         latitude and longitude are strings (+- decimal degrees) to be use
         by other part of the program calling this method.
+        (see SyncResult.asList)
         """
-        interpolation=True # To use or not an interpolation mode(instead of nearest point)
-        pic=GeoExif(picture)
-        picDateTimeSize=pic.readDateTimeSize()
-        if picDateTimeSize[0]=="nodate":
-            return [" : WARNING: DIDN'T GEOCODE, no Date/Time Original in this picture.",
-            ""]
+        pic=GeoExif(picture,self.xmpSidecar)
+        result=self.matcher.match([(picture,pic.readDateTimeSize())])[0]
+        self.writeResult(pic,result)
+        return result.asList()
 
-        # create a proper datetime object (self.shot_datetime)
-        pict=(picDateTimeSize[0]+":"+picDateTimeSize[1]).split(":")
-        #print ">>> picture original date/time from EXIF: ",pict
-        self.pic_datetime=datetime.datetime(
-                                            int(pict[0]),
-                                            int(pict[1]),
-                                            int(pict[2]),
-                                            int(pict[3]),
-                                            int(pict[4]),
-                                            int(pict[5]))
-        #print ">>> self.pic_datetime (from picture EXIF): ",self.pic_datetime
-        self.pic_datetimeUTC=self.pic_datetime-datetime.timedelta(seconds=self.localOffset)
-        if self.timezone:
-            self.pic_datetimeUTC = self.timezone.localize(self.pic_datetimeUTC).astimezone(pytz.utc).replace(tzinfo=None)
-        #print ">>> self.pic_datetimeUTC (time corrected if offset):",self.pic_datetimeUTC
-
-        self.shotTime=picDateTimeSize[1]
-        self.shotDate=picDateTimeSize[0].replace(":","-")
-        self.timeStamp=self.shotDate+"T"+picDateTimeSize[1]
-        self.picWidth=picDateTimeSize[2]
-        self.picHeight=picDateTimeSize[3]
-        latitude=""
-        longitude=""
-        elevation=""
-        #print "Picture shotTime was", self.shotTime
-        tpic_tgps_l=864000 # will try  match a pic within 864000 seconds (10 days)
+    def syncPictures(self,pictures,moreTags=None,stop=None):
+        """
+        Generator geocoding a list of pictures, like syncPicture for each
+        but faster with many pictures: all the pictures times are read first
+        and the track positions at these times are computed in one go (see
+        Matcher.match).
+        Yields a tuple (picture,result) per picture, 'result' being the list
+        returned by syncPicture. The pictures without Date/Time Original come
+        first, then the others in the order they were taken.
+        The positions are written by batches of WRITE_BATCH pictures (see
+        GpsWriter), a picture is yielded once its batch is written.
+        moreTags: a function returning for a geocoded SyncResult a list of
+        exiftool arguments to write with its position (like the geonames
+        keywords), so that each picture is rewritten only once
+        stop: a function returning True to stop before the next picture, the
+        pictures already handled in the current batch are still written
+        and yielded
+        """
+        results=self.matchPictures(pictures)
+        for first in range(0,len(results),WRITE_BATCH):
+            if stop is not None and stop(): return
+            batch=[]
+            writer=GpsWriter(self.backup,self.xmpSidecar)
+            for result in results[first:first+WRITE_BATCH]:
+                if stop is not None and stop(): break
+                if result.geocoded and moreTags is not None:
+                    self.writeResult(writer,result,moreTags(result))
+                else:
+                    self.writeResult(writer,result)
+                batch.append(result)
+            failed=set([picture for picture,written in writer.write() if not written])
+            for result in batch:
+                answer=result.asList()
+                if result.picture in failed:
+                    answer[0]=_(" : WARNING: DIDN'T GEOCODE, ")+_("exiftool couldn't write the position in this picture")
+                yield result.picture,answer
 
-        if len(self.track)==0:
-            return [_(" : WARNING: DIDN'T GEOCODE, ")+_("no track points found - ")\
-                     +self.shotDate+"-"+self.shotTime,"","",self.picWidth,self.picHeight,elevation]
-
-        for n,rec in enumerate(self.track):
-            delta_datetime=self.pic_datetimeUTC-rec["datetime"]
-            rec["tpic_tgps_l"]=delta_datetime.days*86400 +delta_datetime.seconds
-            if abs(rec["tpic_tgps_l"])<tpic_tgps_l:
-                N=n
-                tpic_tgps_l=abs(rec["tpic_tgps_l"])
-                latitude,longitude,elevation=rec['lat'],rec['lon'],rec['ele']
-                if float(latitude)>0:latRef="N"
-                else: latRef="S"
-                if float(longitude)>0:longRef="E"
-                else: longRef="W"
-
-        if (self.interpolation==True) and (self.track[N]!=0):
-            try:
-                #print ">>> N (nearest trackpoint) in GPX list is index = ",N
-                #print ">>> Trackpoint N Latitude= ", latitude," Longitude= ",longitude
-
-                if (self.track[N]["tpic_tgps_l"]*self.track[N+1]["tpic_tgps_l"])<=0:
-                    M=N+1
-                    #print ">>> Chose point M=N+1 as second nearest valid trackpoint for interpolation"
-                elif (self.track[N]["tpic_tgps_l"]*self.track[N+1]["tpic_tgps_l"])>0:
-                    M=N-1
-                    #print ">>> Chose point M=N-1 as second nearest valid trackpoint for interpolation"
-
-                dLonNM=float(self.track[M]['lon'])-float(self.track[N]['lon'])
-                dLatNM=float(self.track[M]['lat'])-float(self.track[N]['lat'])
-                #print ">>> dLonNM= ",dLonNM,"dLatNM= ",dLatNM
-                ratio=abs(float(self.track[N]["tpic_tgps_l"]))\
-                /(abs(self.track[N]["tpic_tgps_l"])+abs(self.track[M]["tpic_tgps_l"]))
-                #print ">>> ratio= ",ratio
-                latitude=float(latitude)+ratio*dLatNM
-                longitude=float(longitude)+ratio*dLonNM
-                if float(latitude)>0:latRef="N"
-                else: latRef="S"
-                if float(longitude)>0:longRef="E"
-                else: longRef="W"
-                latitude=str(latitude)
-                longitude=str(longitude)
-            except:
-                print "Had a problem with interpolation tuning, probably the time\
-                of the picture is off the time of the track"
-
-        if latitude != "" and longitude !="" and (tpic_tgps_l< self.timerange):
-            print "Writing best lat./long. match to pic. EXIF -->",latitude,latRef,\
-            longitude,longRef,"with tpic-tgps=",tpic_tgps_l,"seconds\n"
-            pic.writeLatLong(latitude,longitude,latRef,longRef,self.backup,elevation)
-            return [ _("taken ")+self.shotDate+"-"+self.shotTime+", "\
-            +_("writing best latitude/longitude match to picture: ")+latRef+\
-            " "+latitude+" ,"+longRef+" "+longitude+" :"+_(" time difference (s)= ")+str(int(tpic_tgps_l)),
-            latitude,longitude,self.picWidth,self.picHeight,self.timeStamp,elevation]
-        else:
-            print "Didn't find any picture for this day or timerange"
-            if tpic_tgps_l !=86400:
-                return [_(" : WARNING: DIDN'T GEOCODE, ")+_("no track point below the maximum time range ")\
-                +"( "+str(self.timerange)+" s) : " +self.shotDate+"-"+self.shotTime+_(" time difference (s)= ")+str(int(tpic_tgps_l))\
-                +"\n"+_("For information nearest trackpoint was at lat=")+latitude+_(" long=")+longitude,"","",self.picWidth,self.picHeight,elevation]
+    def matchPictures(self,pictures):
+        """
+        Reads the times of the pictures (with a single exiftool command, see
+        readPicturesInfo) and returns their SyncResult (see Matcher.match),
+        the pictures without Date/Time Original first then the others in
+        the order they were taken. Nothing is written in the pictures (see
+        plan.py to save the results and write them later).
+        """
+        pictures=list(pictures)
+        infos=readPicturesInfo(pictures)
+        results=self.matcher.match([(picture,infos[picture]["dateTimeSize"])
+        for picture in pictures])
+        results.sort(key=lambda result:result.picTime)
+        return results
+
+    def writeResult(self,pic,result,tags=()):
+        """
+        Writes the position of a SyncResult in the picture pic (a GeoExif),
+        or adds it to pic if it's a GpsWriter, with the exiftool arguments
+        of tags if any.
+        """
+        if result.geocoded:
+            print "Writing best lat./long. match to pic. EXIF -->",result.latitude,result.latRef,\
+            result.longitude,result.longRef,"with tpic-tgps=",result.delta,"seconds\n"
+            if isinstance(pic,GpsWriter):
+                pic.add(result.picture,result.latitude,result.longitude,result.latRef,
+                result.longRef,result.elevation,tags)
             else:
-                return [_(" : WARNING: DIDN'T GEOCODE, ")+_("no track point at this picture date ")\
-                 +self.shotDate+"-"+self.shotTime,"","",self.picWidth,self.picHeight,elevation]
+                pic.writeLatLong(result.latitude,result.longitude,result.latRef,result.longRef,
+                self.backup,result.elevation,tags)
+        elif result.delta is not None:
+            print "Didn't find any picture for this day or timerange"
 
 if __name__=="__main__":
 
@@ -183,8 +395,14 @@ if __name__=="__main__":
     parser=OptionParser()
     parser.add_option("-d", "--directory",dest="dir",
      help="Directory containing the pictures. Expl. mypictures")
-    parser.add_option("-g", "--gpx",dest="gpx",
-     help="Path to the gpx file. Expl. mypicture/tracklog.gpx")
+    parser.add_option("-g", "--gpx",dest="gpx",action="append",
+     help="Path to the gpx file (or NMEA .txt log, Garmin .fit or .tcx file, \
+    possibly compressed in "+", ".join(sorted(COMPRESSIONS))+"), \
+    repeat the option to use several files. Expl. mypicture/tracklog.gpx")
+    parser.add_option("-l", "--library",dest="library",action="append",
+     help="Directory of gps files to add to the track library (in ~/.gpicsync), \
+    the files of the library covering the pictures times are used in addition \
+    to the -g files, repeat the option to use several directories. Expl. mygpslogs")
     parser.add_option("-o", "--offset",dest="offset",
      help="A positive or negative number to indicate offset hours\
     to the greenwich meridian (East positive, West negative, 1 for France)")
@@ -196,9 +414,35 @@ if __name__=="__main__":
     parser.add_option("--tgps",dest="tgps",
      help="Actual time of the GPS only if it was out of sync with the camera \
     Expl. 10:06:00")
+    parser.add_option("-w", "--workers",dest="workers",type="int",default=1,
+     help="Number of processes reading the gpx files in parallel \
+    when several files are given. Expl. 4")
+    parser.add_option("--window",dest="window",action="store_true",default=False,
+     help="Read the pictures times first and only load the track points \
+    around them (useful with big gpx archives)")
+    parser.add_option("--auto-offset",dest="autoOffset",action="store_true",default=False,
+     help="Estimate the camera clock error (up to 12 hours) from the pictures \
+    times and the track, and correct it")
+
+    parser.add_option("--plan",dest="plan",
+     help="Only match the pictures and save the positions found in this plan \
+    file (.csv or .json) to review them, see --apply. Expl. plan.csv")
+    parser.add_option("--apply",dest="apply",
+     help="Write the positions of a plan file made with --plan in the pictures, \
+    without reading any gps file. Expl. plan.csv")
+    parser.add_option("--xmp",dest="xmpSidecar",action="store_true",default=False,
+     help="Write the positions of the RAW pictures in .xmp sidecar files \
+    instead of rewriting the RAW files")
 
     (options,args)=parser.parse_args()
 
+    if options.apply:
+        print "\nWriting the positions of the plan",options.apply,"...\n"
+        for picture,row in applyPlan(loadPlan(options.apply),xmpSidecar=options.xmpSidecar):
+            print "Wrote",row["lat"],row["lon"],"in",picture
+        print "Finished"
+        sys.exit(0)
+
     if options.tcam==None: options.tcam="00:00:00"
     if options.tgps==None: options.tgps="00:00:00"
     if options.offset is not None and options.timezone is not None:
@@ -206,13 +450,16 @@ if __name__=="__main__":
         sys.exit(1)
     if options.offset==None: options.offset=0
     if options.dir==None: options.dir="."
-    if options.gpx==None:
+    if options.gpx==None and options.library==None:
         print >> sys.stderr, "I need a .gpx file \nType Python gpicsync.py -h for help."
         sys.exit(1)
-    options.gpx=[options.gpx]
     print "\nEngage processing using the following arguments ...\n"
     print "-Directory containing the pictures:",options.dir
     print "-Path to the gpx file:",options.gpx
+    if options.library:
+        print "-Track library directories:",options.library
+    if options.workers>1:
+        print "-Processes reading the gpx files:",options.workers
     if options.timezone:
         print "-Time Zone name:",options.timezone
     else:
@@ -221,9 +468,7 @@ if __name__=="__main__":
     print "-- GPS local display time:",options.tgps
     print "\n"
 
-    geo=GpicSync(gpxFile=options.gpx,
-    tcam_l=options.tcam,tgps_l=options.tgps,UTCoffset=int(options.offset),timerange=3600,timezone=options.timezone)
-
+    pictures=[]
     for fileName in os.listdir ( options.dir ):
         if fnmatch.fnmatch ( fileName, '*.JPG' )\
         or fnmatch.fnmatch ( fileName, '*.jpg' )\
@@ -245,9 +490,38 @@ if __name__=="__main__":
         or fnmatch.fnmatch ( fileName, '*.raf' )\
         or fnmatch.fnmatch ( fileName, '*.MRW' )\
         or fnmatch.fnmatch ( fileName, '*.mrw' ):
+            pictures.append(fileName)
+
+    library=None
+    if options.library:
+        library=TrackLibrary()
+        for directory in options.library:
+            print "Indexed",library.register(directory),"new or changed gps files in",directory
+
+    if options.window and options.autoOffset:
+        print "-The whole track is loaded to estimate the camera clock error (--window ignored)"
+    if (options.window or library) and not options.autoOffset:
+        picturesWindow=[options.dir+'/'+fileName for fileName in pictures]
+    else:
+        picturesWindow=None
+    geo=GpicSync(gpxFile=options.gpx,
+    tcam_l=options.tcam,tgps_l=options.tgps,UTCoffset=int(options.offset),timerange=3600,timezone=options.timezone,
+    workers=options.workers,pictures=picturesWindow,library=library,xmpSidecar=options.xmpSidecar)
+
+    if options.autoOffset:
+        offset,count=geo.estimateOffset(geo.picturesTimes([options.dir+'/'+fileName for fileName in pictures]))
+        print "Estimated camera clock error (seconds):",offset,"-",count,"pictures match the track"
+        geo.localOffset+=offset
+
+    if options.plan:
+        results=geo.matchPictures([options.dir+'/'+fileName for fileName in pictures])
+        savePlan(planRows(results),options.plan)
+        print "\nSaved the positions of",len([result for result in results if result.geocoded]),\
+        "pictures out of",len(results),"in the plan",options.plan
+        sys.exit(0)
 
-            print "\nFound fileName ",fileName," Processing now ..."
-            geo.syncPicture(options.dir+'/'+fileName)[0]
+    for picture,result in geo.syncPictures([options.dir+'/'+fileName for fileName in pictures]):
+        print "\nProcessed",picture,":",result[0]
     print "Finished"
 
 
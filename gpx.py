@@ -2,8 +2,8 @@
 
 ###############################################################################
 # (c) francois.schnell  francois.schnell@gmail.com
-#                       http://francois.schnell.free.fr 
-#  
+#                       http://francois.schnell.free.fr
+#
 # This script is released under the GPL v2 license
 #
 ###############################################################################
@@ -11,90 +11,272 @@
 """
 A class to read longitude, latitude, time&date from track points in a gpx file.
 
-It creates a list with a  dictionary per valid gps track point.
+NMEA logs (.txt or .nmea files, see nmea.py), Garmin TCX files and Garmin
+FIT files (see fit.py) are read too, and all these files can be compressed
+(.gpx.gz, .gpx.bz2, .gpx.xz ...).
+
+It creates a Track (see track.py) with the valid gps track points, which
+can also be read as a list with a  dictionary per valid gps track point.
         Dictionary keys:
         'date': returns a string date like '2006-11-05'
         'lat': returns a string latitude like '48.5796761739'
         'lon': returns a string longitude like '7.2847080265'
         'time': returns a string 24h time (hh mm sss) like '15:21:27'
         'ele': returns the elevation if it exist and "None" otherwise
+
+The gpx files are read with a streaming parser: track points are handled one
+by one and dropped from the XML tree as soon as they are read so the memory
+used doesn't depend on the size of the gpx files.
+The parsed tracks are cached in a binary file per gpx file (in CACHE_DIR)
+and read back from there as long as the gpx file doesn't change.
 """
 
-import xml.etree.ElementTree as ET,re,sys,datetime
+import os,sys,hashlib,zlib,multiprocessing
+try:
+    import xml.etree.cElementTree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+from track import *
+from nmea import parseNmea
+from fit import parseFit
+
+# where the parsed gps files are kept (see readTrackFile)
+CACHE_DIR=os.path.join(os.path.expanduser("~"),".gpicsync","cache")
+
+def localName(tag):
+    """Returns a tag name without its namespace ('{http://...}trkpt' -> 'trkpt')"""
+    return tag.rsplit("}",1)[-1]
+
+def childText(elem,name):
+    """Returns the stripped text of the first child called 'name' or None"""
+    for child in elem:
+        if localName(child.tag)==name:
+            if child.text is None: return None
+            return child.text.strip()
+    return None
+
+def readGpx(fileName):
+    """
+    Generator reading a gpx file incrementally.
+    Yields a tuple (kind,time,lat,lon,ele) of strings for each track point
+    or waypoint having a time, where kind is 'trkpt' or 'wpt' and ele is
+    "None" when there is no elevation.
+    """
+    stack=[]
+    f=openTrackFile(fileName)
+    try:
+        try:
+            for event,elem in ET.iterparse(f,events=("start","end")):
+                if event=="start":
+                    stack.append(elem)
+                    continue
+                stack.pop()
+                kind=localName(elem.tag)
+                if kind not in ("trkpt","wpt"):
+                    continue
+                time=childText(elem,"time")
+                if time:
+                    ele=childText(elem,"ele")
+                    if not ele: ele="None"
+                    yield (kind,time,elem.get("lat","").strip(),elem.get("lon","").strip(),ele)
+                # drop the point from the tree so memory stays bounded
+                elem.clear()
+                if stack: stack[-1].remove(elem)
+        except ET.ParseError,e:
+            # a truncated file: keep the points read before the error
+            print "Warning: stopped reading the invalid gpx file",fileName,":",e
+    finally:
+        f.close()
+
+def readTcx(fileName):
+    """
+    Generator reading a Garmin TCX file incrementally.
+    Yields a tuple (time,lat,lon,ele) for each Trackpoint having a time and a
+    position, time in epoch seconds and ele NaN when there is no altitude.
+    """
+    stack=[]
+    f=openTrackFile(fileName)
+    try:
+        try:
+            for event,elem in ET.iterparse(f,events=("start","end")):
+                if event=="start":
+                    stack.append(elem)
+                    continue
+                stack.pop()
+                if localName(elem.tag)!="Trackpoint":
+                    continue
+                time=childText(elem,"Time")
+                position=None
+                for child in elem:
+                    if localName(child.tag)=="Position": position=child
+                if time and position is not None:
+                    try:
+                        ele=childText(elem,"AltitudeMeters")
+                        if ele: ele=float(ele)
+                        else: ele=NAN
+                        yield (parseIsoTime(time),float(childText(position,"LatitudeDegrees")),
+                        float(childText(position,"LongitudeDegrees")),ele)
+                    except (ValueError,TypeError):
+                        print "Skipping a TCX point with an invalid time or position:",time
+                elem.clear()
+                if stack: stack[-1].remove(elem)
+        except ET.ParseError,e:
+            # a truncated file: keep the points read before the error
+            print "Warning: stopped reading the invalid TCX file",fileName,":",e
+    finally:
+        f.close()
+
+def parseTcx(fileName,window=None):
+    """
+    Returns a Track with the track points of a TCX file, sorted by time
+    window: only keep the points of this (start,end) time range, see buildTrack
+    """
+    track=buildTrack(readTcx(fileName),window)
+    print "Number of TCX track points kept: ",len(track)
+    return track
+
+def sourceKey(fileName):
+    """
+    Returns a string identifying the current content of a gps file: its path,
+    size, modification time and a checksum of its first and last 64KB.
+    """
+    path=os.path.abspath(fileName)
+    if isinstance(path,unicode): path=path.encode("utf-8")
+    stat=os.stat(fileName)
+    f=open(fileName,"rb")
+    try:
+        checksum=zlib.crc32(f.read(65536))
+        if stat.st_size>65536:
+            f.seek(max(65536,stat.st_size-65536))
+            checksum=zlib.crc32(f.read(),checksum)
+    finally:
+        f.close()
+    return "%s\n%d\n%r\n%d" % (path,stat.st_size,stat.st_mtime,checksum & 0xffffffff)
+
+def cacheFile(key):
+    """Returns the path of the cache file of a gps file in CACHE_DIR"""
+    return os.path.join(CACHE_DIR,hashlib.md5(key.split("\n",1)[0]).hexdigest()+".cache")
+
+def gpxPoints(fileName):
+    """
+    Generator of the (time,lat,lon,ele) points of a gpx file: the timed
+    track points, then the timed waypoints (transformed into trackpoints).
+    Times are in epoch seconds and ele is NaN when unknown.
+    """
+    waypoints=[]
+    for kind,time,lat,lon,ele in readGpx(fileName):
+        try:
+            if ele=="None": ele=NAN
+            point=(parseIsoTime(time),float(lat),float(lon),float(ele))
+        except ValueError:
+            print "Skipping a point with an invalid time or position:",time,lat,lon
+            continue
+        if kind=="trkpt":
+            yield point
+        else:
+            waypoints.append(point)
+    if len(waypoints)>0:
+        print "transforming",len(waypoints),"timed waypoints into trackpoints"
+    for point in waypoints:
+        yield point
+
+def parseGpx(fileName,window=None):
+    """
+    Returns a Track with the timed track points and the timed waypoints
+    of a gpx file, sorted by time.
+    window: only keep the points of this (start,end) time range, see buildTrack
+    """
+    track=buildTrack(gpxPoints(fileName),window)
+    print "Number of timed track points kept: ",len(track)
+    return track
+
+# parser of the gps files by extension, the other files are read as gpx
+PARSERS={
+    ".gpx":parseGpx,
+    ".txt":parseNmea,
+    ".nmea":parseNmea,
+    ".tcx":parseTcx,
+    ".fit":parseFit,
+}
+
+def parseTrackFile(fileName,window=None):
+    """Returns the Track of a gps file, using the parser of its extension"""
+    return PARSERS.get(trackExtension(fileName),parseGpx)(fileName,window)
+
+def readTrackFile(fileName,cache=True,window=None):
+    """
+    Returns the Track of a gps file, read from the cache in CACHE_DIR when the
+    file didn't change since it was last parsed.
+    window: only return the points of this (start,end) time range in epoch
+    seconds (see track.buildTrack). Only the points of the window are read
+    from the cache. Without cache the points out of the window are dropped
+    while parsing; when the file has to be parsed for the cache it is parsed
+    completely so the cache can be used for any window later.
+    """
+    if not cache:
+        return parseTrackFile(fileName,window)
+    key=sourceKey(fileName)
+    track=loadTrack(cacheFile(key),key,window)
+    if track is not None:
+        print "Read",len(track),"track points from the cache for",fileName
+        return track
+    track=parseTrackFile(fileName)
+    try:
+        if not os.path.isdir(CACHE_DIR): os.makedirs(CACHE_DIR)
+        saveTrack(track,cacheFile(key),key)
+    except (IOError,OSError),e:
+        print "Couldn't write the track cache:",e
+    if window is not None:
+        track=track.window(*window)
+    return track
+
+def readTrackFileWorker(args):
+    """readTrackFile for a worker process of multiprocessing.Pool.map"""
+    return readTrackFile(*args)
 
 class Gpx(object):
-    def __init__(self,gpxFile):
-        """ create a list with the trkpts found in the .gpx file """
-        self.gpx_trkpts=[]#The valid list of trackpoints
-        gpx_file=""
-        i=0
-        for f in gpxFile:
-            gpx_file+= open(gpxFile[i],'r').read()
-            i+=1
-        #print gpx_file
-        regex=re.compile('(<trkpt.*?</trkpt>)',re.S)
-        gpx_trkpts_found=regex.findall(gpx_file)
-        #print gpx_trkpts_found
-        print "Number of raw track points found: ",len(gpx_trkpts_found)
-        i=1
-        for trkpt in gpx_trkpts_found:
-            if trkpt.find("time")>0: self.gpx_trkpts.append(trkpt)
-            i=i+1
-        regex=re.compile('(<wpt.*?</wpt>)',re.S)
-        gpx_wpts_found=regex.findall(gpx_file)
-        for waypoint in gpx_wpts_found:
-            if waypoint.find("time")>0:
-                print "transforming waypoints into trackpoints"
-                waypoint="<trkpt "+waypoint[5:-7]+"\n</trkpt>"
-                print waypoint,"\n"
-                self.gpx_trkpts.append(waypoint)
-        if len(self.gpx_trkpts)==0:print "Didn't find any valid trkpt :("
-        print "Number of valid track points found: ",len(self.gpx_trkpts)
-        #print self.gpx_trkpts
+    def __init__(self,gpxFile,cache=True,workers=1,window=None):
+        """
+        create a Track with the trkpts found in the .gpx files
+        cache: keep the parsed tracks in CACHE_DIR to avoid parsing the same
+        gpx files again
+        workers: number of processes reading the files in parallel when
+        several files are given
+        window: only keep the points of this (start,end) time range in epoch
+        seconds, plus the closest point before and after it
+        """
+        workers=min(workers,len(gpxFile))
+        if workers>1:
+            print "Reading",len(gpxFile),"files with",workers,"worker processes"
+            pool=multiprocessing.Pool(workers)
+            try:
+                tracks=pool.map(readTrackFileWorker,[(f,cache,window) for f in gpxFile])
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            tracks=[readTrackFile(f,cache,window) for f in gpxFile]
+        #The valid trackpoints of all the files in a single timeline
+        self.track=mergeTracks(tracks)
+        duplicates=sum([len(track) for track in tracks])-len(self.track)
+        if duplicates>0:
+            print "Dropped",duplicates,"track points with the same time as another one"
+        if len(self.track)==0:print "Didn't find any valid trkpt :("
+        print "Number of valid track points found: ",len(self.track)
 
     def extract(self):
         """
-        Create a list with a  dictionary per gps track point.
+        Returns a sequence with a dictionary per gps track point.
         Dictionary keys:
         'date': returns a string date like '2006-11-05'
         'lat': returns a string latitude like '48.5796761739'
         'lon': returns a string longitude like '7.2847080265'
         'time': returns a string 24h time (hh mm sss) like '15:21:27'
+        The dictionaries are built on demand, use Gpx.track directly when
+        possible.
         """
-        print "Extracting data from valids track points ..."
-        self.geoData=[]
-        for line in self.gpx_trkpts:
-            #lineTree=ET.fromstring(line)
-            time= re.search('(<time.*?</time>)',line).group()
-            try:
-                elevation=re.search('(<ele>.*?</ele>)',line).group()
-                elevation=elevation.split("</ele>")[0].split("<ele>")[1]
-            except:
-                elevation="None"
-            #print elevation
-            gpst=((time[6:16].replace("-",":"))+":"+time[17:25]).split(":")
-            #print ">>> gpst:",gpst
-            gps_datetimeUTC=datetime.datetime(
-                                            int(gpst[0]),
-                                            int(gpst[1]),
-                                            int(gpst[2]),
-                                            int(gpst[3]),
-                                            int(gpst[4]),
-                                            int(gpst[5]))
-            #print ">>>self.gps_datetimeUTC:",gps_datetimeUTC
-            self.geoData.append({
-            'date':time[6:16],
-            'time':time[17:25],
-            'lat':re.search('lat=".*?"',line).group().split('"')[1].strip(),
-            'lon':re.search('lon=".*?"',line).group().split('"')[1].strip(),
-            #'lat':lineTree.attrib["lat"].strip(),
-            #'lon':lineTree.attrib["lon"].strip(),
-            'ele':str(elevation).strip(),
-            'datetime':gps_datetimeUTC,
-            })
-        #print self.geoData
-        return self.geoData
-    
+        return self.track.dicts()
+
 if __name__=="__main__":
-    myGpx=Gpx("test2.gpx") 
-    print myGpx.extract()     
+    myGpx=Gpx(["test2.gpx"])
+    print myGpx.extract()
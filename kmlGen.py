@@ -13,6 +13,7 @@
 from geoexif import *
 from gpx import *
 import time
+from itertools import izip
 from thread import start_new_thread
         
 class KML(object):
@@ -274,25 +275,25 @@ class KML(object):
             return headPath
         
         endPath="\n</coordinates>\n</LineString>\n</Placemark>\n\n"
-        bodyPath=""
-        myGpx=Gpx(gpxFile) 
-        track=myGpx.extract()
-                
-        for rec in track:
-            if rec['ele']=="None" or rec['ele']=="": rec['ele']="0"
+        bodyPath=[]
+        track=Gpx(gpxFile).track
+
+        for lat,lon,ele in izip(track.lats,track.lons,track.eles):
+            if ele!=ele: ele="0"
+            else: ele=formatElevation(ele)
             if i<part:
-                bodyPath=bodyPath+rec['lon']+','+rec['lat']+','+rec['ele']+" "
+                bodyPath.append(formatCoordinate(lon)+','+formatCoordinate(lat)+','+ele+" ")
                 i=i+1
             if i==part:
                 self.f.write(makeHeadPath(j))
-                self.f.write(bodyPath)
+                self.f.write("".join(bodyPath))
                 self.f.write(endPath)
                 i=1
                 j=j+1
-                bodyPath=""
+                bodyPath=[]
 
         self.f.write(makeHeadPath(j))
-        self.f.write(bodyPath)
+        self.f.write("".join(bodyPath))
         self.f.write(endPath)
         
         self.f.write("</Folder>\n")
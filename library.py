@@ -0,0 +1,168 @@
+#!/usr/bin/python
+
+###############################################################################
+#
+# This script is released under the GPL v2 license
+#
+###############################################################################
+
+"""
+A library of gps files for gpicsync.
+
+The directories of gps files (gpx, NMEA, TCX, FIT, possibly compressed) are
+registered once in a TrackLibrary. Their tracks are cut into segments at
+the gaps of more than SEGMENT_GAP seconds, and the time span and bounding
+box of each segment are kept in an SQLite database (LIBRARY_FILE), so the
+files covering the time range of a pictures folder are found without
+reading any gps file:
+
+    library=TrackLibrary()
+    library.register("/home/me/gps-logs")
+    files=library.files(start,end)
+
+Registering a directory again only reads the files which changed.
+"""
+
+import os,sqlite3
+from gpx import *
+
+LIBRARY_FILE=os.path.join(os.path.expanduser("~"),".gpicsync","library.db")
+SEGMENT_GAP=3600 # seconds without points starting a new segment
+
+SCHEMA="""
+CREATE TABLE IF NOT EXISTS directories (path TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY,path TEXT UNIQUE,
+size INTEGER,mtime REAL);
+CREATE TABLE IF NOT EXISTS segments (file INTEGER,segment INTEGER,
+start INTEGER,end INTEGER,minLat REAL,maxLat REAL,minLon REAL,maxLon REAL);
+CREATE INDEX IF NOT EXISTS segmentsStart ON segments (start);
+CREATE INDEX IF NOT EXISTS segmentsFile ON segments (file);
+"""
+
+def isTrackFile(fileName):
+    """True if fileName has the extension of a gps file read by gpicsync"""
+    return trackExtension(fileName) in PARSERS
+
+def trackSegments(track,gap=SEGMENT_GAP):
+    """
+    Returns the segments of a sorted Track, the parts without a gap of more
+    than 'gap' seconds, as a list of (start,end,minLat,maxLat,minLon,maxLon).
+    """
+    segments=[]
+    times=track.times
+    first=0
+    for i in xrange(1,len(times)+1):
+        if i==len(times) or times[i]-times[i-1]>gap:
+            lats=track.lats[first:i]
+            lons=track.lons[first:i]
+            segments.append((times[first],times[i-1],min(lats),max(lats),min(lons),max(lons)))
+            first=i
+    return segments
+
+class TrackLibrary(object):
+    """
+    An index of the time spans of the track segments of gps files (see the
+    module documentation).
+    """
+    def __init__(self,fileName=LIBRARY_FILE,gap=SEGMENT_GAP):
+        """
+        Opens (or creates) the library in the SQLite database fileName
+        gap: seconds without points starting a new segment
+        """
+        directory=os.path.dirname(fileName)
+        if directory and not os.path.isdir(directory): os.makedirs(directory)
+        self.gap=gap
+        self.db=sqlite3.connect(fileName)
+        self.db.text_factory=str # the paths are byte strings
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def register(self,directory):
+        """
+        Adds the gps files of a directory and its sub-directories to the
+        library, or updates them if the directory was already registered.
+        Returns the number of files (re)indexed.
+        """
+        directory=os.path.abspath(directory)
+        self.db.execute("INSERT OR IGNORE INTO directories VALUES (?)",(directory,))
+        self.db.commit()
+        return self.scan(directory)
+
+    def update(self):
+        """
+        Updates the library with the files added, changed or deleted in
+        the registered directories. Returns the number of files (re)indexed.
+        """
+        directories=[row[0] for row in self.db.execute("SELECT path FROM directories")]
+        return sum([self.scan(directory) for directory in directories])
+
+    def scan(self,directory):
+        """Indexes the new and changed gps files of a directory"""
+        known={}
+        for fileId,path,size,mtime in self.db.execute(
+        "SELECT id,path,size,mtime FROM files WHERE path>=? AND path<?",
+        (directory+os.sep,directory+chr(ord(os.sep)+1))):
+            known[path]=(fileId,size,mtime)
+        indexed=0
+        for root,dirs,files in os.walk(directory):
+            for name in files:
+                path=os.path.join(root,name)
+                if not isTrackFile(path): continue
+                stat=os.stat(path)
+                if path in known:
+                    fileId,size,mtime=known.pop(path)
+                    if size==stat.st_size and mtime==stat.st_mtime: continue
+                    self.db.execute("DELETE FROM files WHERE id=?",(fileId,))
+                    self.db.execute("DELETE FROM segments WHERE file=?",(fileId,))
+                self.index(path,stat)
+                indexed+=1
+        for path,(fileId,size,mtime) in known.items():
+            # deleted files
+            self.db.execute("DELETE FROM files WHERE id=?",(fileId,))
+            self.db.execute("DELETE FROM segments WHERE file=?",(fileId,))
+        self.db.commit()
+        return indexed
+
+    def index(self,path,stat):
+        """Adds the segments of a gps file to the library"""
+        print "Indexing",path
+        try:
+            track=readTrackFile(path)
+        except Exception,e:
+            # kept in the library without segments until it changes
+            print "Couldn't read",path,":",e
+            track=Track()
+        cursor=self.db.execute("INSERT INTO files (path,size,mtime) VALUES (?,?,?)",
+        (path,stat.st_size,stat.st_mtime))
+        fileId=cursor.lastrowid
+        self.db.executemany("INSERT INTO segments VALUES (?,?,?,?,?,?,?,?)",
+        [(fileId,i)+segment for i,segment in enumerate(trackSegments(track,self.gap))])
+
+    def segments(self,start,end):
+        """
+        Returns the segments overlapping the time range start-end (epoch
+        seconds) as a list of (path,segment,start,end,minLat,maxLat,minLon,
+        maxLon) sorted by time, 'segment' being the number of the segment in
+        its file.
+        """
+        # a segment starts at most 'longest' seconds before it ends, which
+        # bounds the range of the start index to search
+        longest=self.db.execute("SELECT MAX(end-start) FROM segments").fetchone()[0]
+        if longest is None: return []
+        return self.db.execute("""SELECT files.path,segment,start,end,minLat,maxLat,minLon,maxLon
+        FROM segments JOIN files ON segments.file=files.id
+        WHERE start BETWEEN ? AND ? AND end>=? ORDER BY start""",
+        (start-longest,end,start)).fetchall()
+
+    def files(self,start=None,end=None):
+        """
+        Returns the sorted list of the gps files with a segment overlapping
+        the time range start-end (epoch seconds), or of all the files having
+        points without a time range.
+        """
+        if start is None:
+            return [row[0] for row in self.db.execute(
+            "SELECT DISTINCT path FROM files JOIN segments ON segments.file=files.id ORDER BY path")]
+        return sorted(set([segment[0] for segment in self.segments(start,end)]))
@@ -0,0 +1,119 @@
+#!/usr/bin/python
+
+###############################################################################
+#
+# This script is released under the GPL v2 license
+#
+###############################################################################
+
+"""
+A reader for NMEA 0183 logs (the .txt files written by many gps loggers).
+
+The fixes are read from the $GPRMC (time, date, position) and $GPGGA (time,
+position, altitude) sentences, whatever the talker ($GN, $GL ...) is, and
+returned as a Track like the ones read from gpx files.
+"""
+
+import calendar
+from track import *
+
+def nmeaSentence(line):
+    """
+    Returns the fields of a NMEA sentence line (without the '$' and the
+    checksum) or None if the line isn't a sentence or its checksum is wrong.
+    """
+    line=line.strip()
+    start=line.find("$")
+    if start<0:
+        return None
+    line=line[start+1:]
+    if "*" in line:
+        line,checksum=line.rsplit("*",1)
+        computed=0
+        for c in line:
+            computed^=ord(c)
+        try:
+            if int(checksum[:2],16)!=computed:
+                return None
+        except ValueError:
+            return None
+    return line.split(",")
+
+def nmeaDegrees(value,hemisphere):
+    """Returns decimal degrees from a NMEA value like '4807.038' and 'N'"""
+    value=float(value)
+    degrees=int(value/100)
+    degrees=degrees+(value-degrees*100)/60.
+    if hemisphere in ("S","W"):
+        degrees=-degrees
+    return degrees
+
+def nmeaSeconds(hhmmss):
+    """Returns the seconds of the day of a NMEA time like '123519.00'"""
+    return int(hhmmss[0:2])*3600+int(hhmmss[2:4])*60+int(hhmmss[4:6])
+
+def readNmea(fileName):
+    """
+    Generator reading a NMEA log line by line.
+    Yields a tuple (time,lat,lon,ele) per fix, time in epoch seconds and ele
+    NaN when there was no altitude for this fix. Fixes seen before the first
+    $GPRMC sentence are skipped because their date is unknown.
+    """
+    day=None # epoch seconds of the current date (from $GPRMC)
+    fix=None # [seconds of the day,lat,lon,ele] of the fix being read
+    f=openTrackFile(fileName)
+    try:
+        for line in f:
+            fields=nmeaSentence(line)
+            if fields is None or len(fields[0])!=5:
+                continue
+            kind=fields[0][2:]
+            try:
+                if kind=="RMC" and len(fields)>9:
+                    if fields[2]!="A" or not fields[9]:
+                        continue
+                    date=fields[9]
+                    year=int(date[4:6])
+                    if year<80: year+=2000
+                    else: year+=1900
+                    newDay=calendar.timegm((year,int(date[2:4]),int(date[0:2]),0,0,0))
+                    seconds=nmeaSeconds(fields[1])
+                    lat=nmeaDegrees(fields[3],fields[4])
+                    lon=nmeaDegrees(fields[5],fields[6])
+                    ele=NAN
+                elif kind=="GGA" and len(fields)>9:
+                    if fields[6] in ("","0") or day is None:
+                        continue
+                    newDay=day
+                    seconds=nmeaSeconds(fields[1])
+                    if fix is not None and seconds<fix[0]-43200:
+                        newDay=day+86400 # passed midnight since the last $GPRMC
+                    lat=nmeaDegrees(fields[2],fields[3])
+                    lon=nmeaDegrees(fields[4],fields[5])
+                    if fields[9]: ele=float(fields[9])
+                    else: ele=NAN
+                else:
+                    continue
+            except ValueError:
+                continue
+            if fix is not None and (fix[0]!=seconds or day!=newDay):
+                yield (day+fix[0],fix[1],fix[2],fix[3])
+                fix=None
+            day=newDay
+            if fix is None:
+                fix=[seconds,lat,lon,ele]
+            elif ele==ele:
+                fix[3]=ele
+        if fix is not None:
+            yield (day+fix[0],fix[1],fix[2],fix[3])
+    finally:
+        f.close()
+
+def parseNmea(fileName,window=None):
+    """
+    Returns a Track with the fixes of a NMEA log, sorted by time
+    window: only keep the fixes of this (start,end) time range, see buildTrack
+    """
+    track=buildTrack(readNmea(fileName),window)
+    print "Number of NMEA fixes kept: ",len(track)
+    return track
@@ -0,0 +1,128 @@
+#!/usr/bin/python
+
+###############################################################################
+#
+# This script is released under the GPL v2 license
+#
+###############################################################################
+
+"""
+Geocoding plans: the positions found for the pictures of a folder, saved
+in a CSV or a JSON file (chosen by the extension, .json or anything else
+for CSV) to be reviewed and written in the pictures later, possibly on
+another machine, without reading the track or matching the pictures again.
+
+A plan has a row per picture with the columns of PLAN_FIELDS:
+        'path': the picture path, relative to the plan file directory
+        'lat', 'lon': decimal degrees, "" if not found
+        'ele': elevation in meters, "None" if unknown
+        'delta': seconds between the picture and the nearest trackpoint
+        'time': Date/Time Original of the picture like '2007-02-12T16:09:10'
+        'geocoded': True if the position is to be written in the picture
+
+    plan=planRows(geo.matchPictures(pictures))
+    savePlan(plan,"plan.csv")
+    ...
+    for picture,row in applyPlan(loadPlan("plan.csv")):
+        ...
+"""
+
+import os,csv
+import json
+from geoexif import GpsWriter,WRITE_BATCH
+
+PLAN_FIELDS=["path","lat","lon","ele","delta","time","geocoded"]
+
+def planRows(results):
+    """Returns the plan rows (dictionaries) of a list of SyncResult"""
+    rows=[]
+    for result in results:
+        if result.delta is None: delta=""
+        else: delta=result.delta
+        if result.picTime is None: picTime=""
+        else: picTime=result.date+"T"+result.time
+        rows.append({
+        "path":result.picture,
+        "lat":result.latitude,
+        "lon":result.longitude,
+        "ele":result.elevation,
+        "delta":delta,
+        "time":picTime,
+        "geocoded":result.geocoded,
+        })
+    return rows
+
+def isJson(fileName):
+    return os.path.splitext(fileName)[1].lower()==".json"
+
+def savePlan(rows,fileName):
+    """Writes the plan rows in fileName, a .json file or a CSV file"""
+    directory=os.path.dirname(os.path.abspath(fileName))
+    rows=[dict(row,path=os.path.relpath(os.path.abspath(row["path"]),directory)) for row in rows]
+    if isJson(fileName):
+        f=open(fileName,"w")
+        try:
+            json.dump(rows,f,indent=1,sort_keys=True)
+        finally:
+            f.close()
+    else:
+        f=open(fileName,"wb")
+        try:
+            writer=csv.DictWriter(f,PLAN_FIELDS)
+            writer.writerow(dict(zip(PLAN_FIELDS,PLAN_FIELDS)))
+            writer.writerows(rows)
+        finally:
+            f.close()
+
+def loadPlan(fileName):
+    """
+    Returns the rows of the plan file fileName (see savePlan) with the
+    paths of the pictures from the current directory. All the values are
+    strings, but 'geocoded' which is a boolean.
+    """
+    directory=os.path.dirname(fileName)
+    if isJson(fileName):
+        f=open(fileName,"r")
+        try:
+            rows=json.load(f)
+        finally:
+            f.close()
+    else:
+        f=open(fileName,"rb")
+        try:
+            rows=list(csv.DictReader(f))
+        finally:
+            f.close()
+    plan=[]
+    for row in rows:
+        row=dict([(key,row.get(key,"")) for key in PLAN_FIELDS])
+        for key in PLAN_FIELDS:
+            if isinstance(row[key],unicode): row[key]=row[key].encode("utf-8")
+        row["path"]=os.path.join(directory,row["path"])
+        row["delta"]=str(row["delta"])
+        row["geocoded"]=row["geocoded"] in (True,"True","true","1")
+        plan.append(row)
+    return plan
+
+def applyPlan(plan,backup=True,xmpSidecar=False):
+    """
+    Generator writing the positions of the geocoded rows of a plan (see
+    loadPlan) in their pictures, by batches of WRITE_BATCH pictures (see
+    GpsWriter, and GeoExif for xmpSidecar). Yields a tuple (picture,row)
+    per picture written.
+    """
+    rows=[row for row in plan if row["geocoded"]]
+    for first in range(0,len(rows),WRITE_BATCH):
+        batch=rows[first:first+WRITE_BATCH]
+        writer=GpsWriter(backup,xmpSidecar)
+        for row in batch:
+            if float(row["lat"])>0: latRef="N"
+            else: latRef="S"
+            if float(row["lon"])>0: longRef="E"
+            else: longRef="W"
+            writer.add(row["path"],row["lat"],row["lon"],latRef,longRef,row["ele"] or "None")
+        for (picture,written),row in zip(writer.write(),batch):
+            if written:
+                yield picture,row
+            else:
+                print "Couldn't write the position in",picture
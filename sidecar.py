@@ -0,0 +1,73 @@
+#!/usr/bin/python
+
+###############################################################################
+#
+# This script is released under the GPL v2 license
+#
+###############################################################################
+
+"""
+XMP sidecar files for the RAW pictures.
+
+In sidecar mode the positions of the RAW pictures are written in a small
+'picture.xmp' file next to them (read by Lightroom, darktable, digiKam...)
+instead of rewriting the RAW files:
+
+    if isRaw(picture):
+        writeSidecar(sidecarPath(picture),lat,lon,ele)
+
+writeSidecar only creates new sidecars, the existing ones are updated
+with exiftool (see GeoExif.latLongArgs) to keep their other tags.
+"""
+
+import os
+
+RAW_EXTENSIONS=[".crw",".cr2",".nef",".pef",".raw",".orf",".dng",".raf",".mrw"]
+
+XMP_TEMPLATE="""<?xpacket begin="\xef\xbb\xbf" id="W5M0MpCehiHzreSzNTczkc9d"?>
+<x:xmpmeta xmlns:x="adobe:ns:meta/" x:xmptk="GPicSync">
+ <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">
+  <rdf:Description rdf:about=""
+    xmlns:exif="http://ns.adobe.com/exif/1.0/">
+   <exif:GPSVersionID>2.2.0.0</exif:GPSVersionID>
+   <exif:GPSLatitude>%s</exif:GPSLatitude>
+   <exif:GPSLongitude>%s</exif:GPSLongitude>%s
+  </rdf:Description>
+ </rdf:RDF>
+</x:xmpmeta>
+<?xpacket end="w"?>
+"""
+XMP_ALTITUDE="""
+   <exif:GPSAltitudeRef>%d</exif:GPSAltitudeRef>
+   <exif:GPSAltitude>%d/1000</exif:GPSAltitude>"""
+
+def isRaw(picture):
+    """True if picture has the extension of a RAW picture"""
+    return os.path.splitext(picture)[1].lower() in RAW_EXTENSIONS
+
+def sidecarPath(picture):
+    """Returns the path of the xmp sidecar of a picture"""
+    return os.path.splitext(picture)[0]+".xmp"
+
+def xmpCoordinate(value,positive,negative):
+    """Returns an angle in the XMP GPSCoordinate format like '45,30.600000N'"""
+    if value>=0: ref=positive
+    else: ref=negative
+    micro=int(round(abs(value)*60*1000000)) # millionths of minutes
+    return "%d,%d.%06d%s" % (micro//60000000,micro%60000000//1000000,micro%1000000,ref)
+
+def writeSidecar(fileName,lat,lon,ele=None):
+    """
+    Creates the xmp sidecar fileName with a GPS position (decimal degrees,
+    and the altitude in meters if ele isn't None). Raises OSError if the
+    file already exists.
+    """
+    if ele is None: altitude=""
+    else: altitude=XMP_ALTITUDE % (int(ele<0),int(round(abs(ele)*1000)))
+    data=XMP_TEMPLATE % (xmpCoordinate(lat,"N","S"),xmpCoordinate(lon,"E","W"),altitude)
+    handle=os.open(fileName,os.O_WRONLY|os.O_CREAT|os.O_EXCL|getattr(os,"O_BINARY",0))
+    f=os.fdopen(handle,"wb")
+    try:
+        f.write(data)
+    finally:
+        f.close()
@@ -0,0 +1,226 @@
+#!/usr/bin/python
+
+###############################################################################
+#
+# This script is released under the GPL v2 license
+#
+###############################################################################
+
+"""Tests of the EXIF header reader and writer (run: python -m unittest discover tests)"""
+
+import os,sys,struct,shutil,tempfile,unittest
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),".."))
+from exifheader import *
+from geoexif import readHeaderInfo
+
+DATE="2007:02:12 16:09:10\x00"
+
+def entry(endian,tag,tiffType,number,value):
+    return struct.pack(endian+"HHI",tag,tiffType,number)+value
+
+def tiffData(endian,gps=True,altitude=True):
+    """
+    A TIFF structure with an IFD0, an EXIF IFD (Date/Time Original and
+    image size) and a GPS IFD (45 30 36 S, 6 7 0 W, 123.4 m below sea level)
+    """
+    ifd0Count=gps and 2 or 1
+    gpsCount=altitude and 6 or 4
+    exifOffset=8+2+12*ifd0Count+4
+    gpsOffset=exifOffset+2+12*3+4
+    dataOffset=gpsOffset+2+12*gpsCount+4
+    data=(endian=="<" and "II" or "MM")+struct.pack(endian+"HI",42,8)
+    data+=struct.pack(endian+"H",ifd0Count)+entry(endian,0x8769,LONG,1,struct.pack(endian+"I",exifOffset))
+    if gps:
+        data+=entry(endian,GPS_IFD_TAG,LONG,1,struct.pack(endian+"I",gpsOffset))
+    data+="\x00"*4
+    data+=struct.pack(endian+"H",3)+entry(endian,0x9003,ASCII,len(DATE),struct.pack(endian+"I",dataOffset))\
+    +entry(endian,0xa002,3,1,struct.pack(endian+"HH",4000,0))\
+    +entry(endian,0xa003,4,1,struct.pack(endian+"I",3000))+"\x00"*4
+    values=DATE
+    if gps:
+        lat=dataOffset+len(values)
+        values+=struct.pack(endian+"6I",45,1,30,1,3600,100)
+        lon=dataOffset+len(values)
+        values+=struct.pack(endian+"6I",6,1,7,1,0,1)
+        data+=struct.pack(endian+"H",gpsCount)+entry(endian,1,ASCII,2,"S\x00\x00\x00")\
+        +entry(endian,2,RATIONAL,3,struct.pack(endian+"I",lat))+entry(endian,3,ASCII,2,"W\x00\x00\x00")\
+        +entry(endian,4,RATIONAL,3,struct.pack(endian+"I",lon))
+        if altitude:
+            ele=dataOffset+len(values)
+            values+=struct.pack(endian+"2I",1234,10)
+            data+=entry(endian,5,BYTE,1,"\x01\x00\x00\x00")+entry(endian,6,RATIONAL,1,struct.pack(endian+"I",ele))
+        data+="\x00"*4
+    else:
+        data+="\x00"*(2+12*gpsCount+4) # unused bytes keeping the offsets
+    return data+values
+
+def jpegData(tiff):
+    """A JPEG file with a JFIF segment, an EXIF segment and a 800x600 SOF0"""
+    app1="Exif\x00\x00"+tiff
+    return "\xff\xd8"+"\xff\xe0"+struct.pack(">H",16)+"JFIF\x00"+"\x00"*9\
+    +"\xff\xe1"+struct.pack(">H",len(app1)+2)+app1\
+    +"\xff\xc0"+struct.pack(">HBHHB",11,8,600,800,3)+"\x00"*3+"\xff\xda"+"\x00"*100+"\xff\xd9"
+
+def rawData(endian,subIfd=True):
+    """
+    A TIFF based RAW file like a NEF: IFD0 is a 160x120 preview and a
+    SubIFD the 4288x2848 image, the EXIF IFD has no image size
+    """
+    ifd0Count=subIfd and 5 or 4
+    exifOffset=8+2+12*ifd0Count+4
+    subOffset=exifOffset+2+12+4
+    dateOffset=subOffset+2+12*3+4
+    data=(endian=="<" and "II" or "MM")+struct.pack(endian+"HI",42,8)
+    data+=struct.pack(endian+"H",ifd0Count)+entry(endian,0xfe,LONG,1,struct.pack(endian+"I",1))\
+    +entry(endian,0x100,3,1,struct.pack(endian+"HH",160,0))+entry(endian,0x101,3,1,struct.pack(endian+"HH",120,0))
+    if subIfd:
+        data+=entry(endian,SUBIFDS_TAG,LONG,1,struct.pack(endian+"I",subOffset))
+    data+=entry(endian,0x8769,LONG,1,struct.pack(endian+"I",exifOffset))+"\x00"*4
+    data+=struct.pack(endian+"H",1)+entry(endian,0x9003,ASCII,len(DATE),struct.pack(endian+"I",dateOffset))+"\x00"*4
+    data+=struct.pack(endian+"H",3)+entry(endian,0xfe,LONG,1,struct.pack(endian+"I",0))\
+    +entry(endian,0x100,LONG,1,struct.pack(endian+"I",4288))\
+    +entry(endian,0x101,LONG,1,struct.pack(endian+"I",2848))+"\x00"*4
+    return data+DATE
+
+class ExifTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory=tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def writeFile(self,name,data):
+        fileName=os.path.join(self.directory,name)
+        f=open(fileName,"wb")
+        f.write(data)
+        f.close()
+        return fileName
+
+    def readFile(self,fileName):
+        f=open(fileName,"rb")
+        try:
+            return f.read()
+        finally:
+            f.close()
+
+    def assertPosition(self,info,lat,lon,ele):
+        self.assertAlmostEqual(info["lat"],lat,6)
+        self.assertAlmostEqual(info["lon"],lon,6)
+        if ele is None: self.assertEqual(info["ele"],None)
+        else: self.assertAlmostEqual(info["ele"],ele,3)
+
+class TestReadExifHeader(ExifTestCase):
+    def testJpeg(self):
+        for endian in "<>":
+            info=readExifHeader(self.writeFile("picture.jpg",jpegData(tiffData(endian))))
+            self.assertEqual(info["DateTimeOriginal"],"2007:02:12 16:09:10")
+            # the size of the SOF segment
+            self.assertEqual((info["width"],info["height"]),(800,600))
+            self.assertPosition(info,-45.51,-6.116666666666666,-123.4)
+
+    def testTiff(self):
+        for endian in "<>":
+            info=readExifHeader(self.writeFile("picture.tif",tiffData(endian,altitude=False)))
+            self.assertEqual(info["DateTimeOriginal"],"2007:02:12 16:09:10")
+            self.assertEqual((info["width"],info["height"]),(4000,3000))
+            self.assertPosition(info,-45.51,-6.116666666666666,None)
+
+    def testRawSubIfd(self):
+        for endian in "<>":
+            fileName=self.writeFile("picture.nef",rawData(endian))
+            info=readExifHeader(fileName)
+            self.assertEqual((info["width"],info["height"]),(4288,2848))
+            self.assertEqual(readHeaderInfo(fileName)["dateTimeSize"],
+            ["2007:02:12","16:09:10","4288","2848"])
+
+    def testRawWithoutImage(self):
+        # only the preview size: exiftool is used
+        fileName=self.writeFile("picture.nef",rawData("<",subIfd=False))
+        info=readExifHeader(fileName)
+        self.assertEqual((info["width"],info["height"]),(None,None))
+        self.assertEqual(readHeaderInfo(fileName),None)
+
+    def testNoExif(self):
+        data=jpegData("")
+        data=data[:data.index("\xff\xe1")]+data[data.index("\xff\xc0"):]
+        info=readExifHeader(self.writeFile("picture.jpg",data))
+        self.assertEqual((info["DateTimeOriginal"],info["width"],info["lat"]),(None,800,None))
+        self.assertRaises(ExifHeaderError,readExifHeader,self.writeFile("picture.png","\x89PNG\r\n"))
+
+    def testCorruptedCounts(self):
+        tiff=tiffData("<")
+        date=entry("<",0x9003,ASCII,len(DATE),"")
+        for corrupted in [
+            tiff[:8]+struct.pack("<H",0xffff)+tiff[10:], # entries of IFD0
+            tiff[:8]+struct.pack("<H",900)+tiff[10:], # entries after the end
+            # a huge Date/Time Original
+            tiff.replace(date,entry("<",0x9003,ASCII,0x7fffffff,""))]:
+            self.assertRaises(ExifHeaderError,readExifHeader,self.writeFile("picture.tif",corrupted))
+            self.assertRaises(ExifHeaderError,readExifHeader,self.writeFile("picture.jpg",jpegData(corrupted)))
+
+    def testIgnoredTags(self):
+        tiff=tiffData("<")
+        for corrupted in [
+            # a GPS IFD pointer with 2 values
+            tiff.replace(entry("<",GPS_IFD_TAG,LONG,1,""),entry("<",GPS_IFD_TAG,LONG,2,"")),
+            # a rational with a zero denominator
+            tiff.replace(struct.pack("<6I",45,1,30,1,3600,100),struct.pack("<6I",45,0,30,1,3600,100))]:
+            info=readExifHeader(self.writeFile("picture.jpg",jpegData(corrupted)))
+            self.assertEqual((info["DateTimeOriginal"],info["lat"]),("2007:02:12 16:09:10",None))
+
+class TestWriteJpegGps(ExifTestCase):
+    def checkWrite(self,data,inPlace,lat=48.5796761739,lon=-7.2847080265,ele=150.25):
+        fileName=self.writeFile("picture.jpg",data)
+        self.assertEqual(writeJpegGps(fileName,lat,lon,ele),inPlace)
+        info=readExifHeader(fileName)
+        self.assertPosition(info,lat,lon,ele)
+        self.assertEqual(info["DateTimeOriginal"],"2007:02:12 16:09:10")
+        self.assertEqual((info["width"],info["height"]),(800,600))
+        new=self.readFile(fileName)
+        if inPlace:
+            self.assertEqual(len(new),len(data))
+        # the image data is kept
+        self.assertEqual(new[new.index("\xff\xc0"):],data[data.index("\xff\xc0"):])
+        self.assertEqual(os.listdir(self.directory),["picture.jpg"])
+        return fileName
+
+    def testInPlace(self):
+        for endian in "<>":
+            self.checkWrite(jpegData(tiffData(endian)),True)
+
+    def testNewIfd(self):
+        for endian in "<>":
+            # no GPS IFD
+            self.checkWrite(jpegData(tiffData(endian,gps=False)),False)
+            # a GPS IFD without altitude
+            self.checkWrite(jpegData(tiffData(endian,altitude=False)),False)
+            # and without altitude written
+            self.checkWrite(jpegData(tiffData(endian,altitude=False)),True,-33.5,151.25,None)
+
+    def testRewrittenTwice(self):
+        fileName=self.checkWrite(jpegData(tiffData("<",gps=False)),False)
+        self.assertTrue(writeJpegGps(fileName,1.5,2.5,-10))
+        self.assertPosition(readExifHeader(fileName),1.5,2.5,-10)
+
+    def testBackup(self):
+        for gps,inPlace in ((True,True),(False,False)):
+            data=jpegData(tiffData("<",gps=gps))
+            fileName=self.writeFile("picture.jpg",data)
+            self.assertEqual(writeJpegGps(fileName,1.5,2.5,3,fileName+"_original"),inPlace)
+            self.assertEqual(self.readFile(fileName+"_original"),data)
+            self.assertPosition(readExifHeader(fileName),1.5,2.5,3)
+            os.remove(fileName+"_original")
+
+    def testOutOfSegment(self):
+        tiff=tiffData("<")
+        # the offset of the GPSLatitude value points after the segment
+        position=tiff.index(entry("<",2,RATIONAL,3,""))+8
+        tiff=tiff[:position]+struct.pack("<I",len(tiff)-8)+tiff[position+4:]
+        data=jpegData(tiff)
+        fileName=self.writeFile("picture.jpg",data)
+        self.assertRaises(ExifHeaderError,writeJpegGps,fileName,1,2,3,fileName+"_original")
+        self.assertEqual(self.readFile(fileName),data)
+        self.assertEqual(os.listdir(self.directory),["picture.jpg"])
+
+if __name__=="__main__":
+    unittest.main()
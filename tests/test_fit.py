@@ -0,0 +1,102 @@
+#!/usr/bin/python
+
+###############################################################################
+#
+# This script is released under the GPL v2 license
+#
+###############################################################################
+
+"""Tests of the FIT file reader (run: python -m unittest discover tests)"""
+
+import os,sys,struct,shutil,tempfile,unittest
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),".."))
+from fit import readFit,FIT_EPOCH,SEMICIRCLES
+
+START=1162739000 # 2006-11-05 15:03:20 UTC
+
+def semicircles(degrees):
+    return int(round(degrees/SEMICIRCLES))
+
+def definition(localType,globalNumber,fields,endian="<"):
+    """A definition message, fields being a list of (number,size,base type)"""
+    data=chr(0x40|localType)+"\x00"+chr(int(endian==">"))+struct.pack(endian+"HB",globalNumber,len(fields))
+    return data+"".join([struct.pack("BBB",*field) for field in fields])
+
+def message(localType,format,values,endian="<"):
+    """A data message with a normal header"""
+    return chr(localType)+struct.pack(endian+format,*values)
+
+def compressed(localType,time,format,values,endian="<"):
+    """A data message with a compressed timestamp header"""
+    return chr(0x80|(localType<<5)|(time & 0x1F))+struct.pack(endian+format,*values)
+
+def fitFile(records):
+    """A FIT file with the given records (the CRCs aren't checked)"""
+    data="".join(records)
+    return struct.pack("<BBHI",14,0x10,2093,len(data))+".FIT"+"\x00\x00"+data+"\x00\x00"
+
+# timestamp, lat, lon, altitude
+RECORD=[(253,4,0x86),(0,4,0x85),(1,4,0x85),(2,2,0x84)]
+
+def records():
+    """A file_id message then three records every 10 s"""
+    data=[definition(0,0,[(0,1,0x00),(4,4,0x86)]),message(0,"BI",[4,START-FIT_EPOCH]),
+    definition(1,20,RECORD)]
+    for i in range(3):
+        data.append(message(1,"IiiH",[START-FIT_EPOCH+10*i,semicircles(48.5+i*0.01),
+        semicircles(7.25),(150+i+500)*5]))
+    return data
+
+class TestFit(unittest.TestCase):
+    def setUp(self):
+        self.directory=tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def readFit(self,data):
+        fileName=os.path.join(self.directory,"test.fit")
+        f=open(fileName,"wb")
+        f.write(data)
+        f.close()
+        return list(readFit(fileName))
+
+    def assertPoints(self,points,expected):
+        self.assertEqual(len(points),len(expected))
+        for point,(time,lat,lon,ele) in zip(points,expected):
+            self.assertEqual(point[0],time)
+            self.assertAlmostEqual(point[1],lat,6)
+            self.assertAlmostEqual(point[2],lon,6)
+            if ele!=ele: self.assertTrue(point[3]!=point[3])
+            else: self.assertAlmostEqual(point[3],ele,6)
+
+    def testRecords(self):
+        self.assertPoints(self.readFit(fitFile(records())),
+        [(START+10*i,48.5+i*0.01,7.25,150+i) for i in range(3)])
+
+    def testBigEndian(self):
+        # enhanced altitude instead of altitude, and an invalid altitude
+        fields=[(253,4,0x86),(0,4,0x85),(1,4,0x85),(2,2,0x84),(78,4,0x86)]
+        data=[definition(2,20,fields,">"),
+        message(2,"IiiHI",[START-FIT_EPOCH,semicircles(-33.5),semicircles(151.25),0xFFFF,(12+500)*5],">"),
+        message(2,"IiiHI",[START-FIT_EPOCH+1,semicircles(-33.5),semicircles(151.25),0xFFFF,0xFFFFFFFF],">")]
+        self.assertPoints(self.readFit(fitFile(data)),
+        [(START,-33.5,151.25,12),(START+1,-33.5,151.25,float("nan"))])
+
+    def testCompressedTimestamps(self):
+        # the time is 5 bits of offset added to the last full timestamp
+        time=START-FIT_EPOCH
+        data=[definition(0,20,RECORD),message(0,"IiiH",[time,semicircles(1),semicircles(2),0xFFFF]),
+        definition(1,20,[(0,4,0x85),(1,4,0x85)])]
+        expected=[(START,1,2,float("nan"))]
+        for delta in (3,20,40):
+            data.append(compressed(1,time+delta,"ii",[semicircles(1),semicircles(2+delta*0.001)]))
+            expected.append((START+delta,1,2+delta*0.001,float("nan")))
+        self.assertPoints(self.readFit(fitFile(data)),expected)
+
+    def testChainedFiles(self):
+        data=fitFile(records())
+        self.assertEqual(len(self.readFit(data+data)),6)
+
+if __name__=="__main__":
+    unittest.main()
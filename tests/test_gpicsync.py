@@ -0,0 +1,44 @@
+#!/usr/bin/python
+
+###############################################################################
+#
+# This script is released under the GPL v2 license
+#
+###############################################################################
+
+"""Tests of the matching of the pictures (run: python -m unittest discover tests)"""
+
+import os,sys,unittest
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),".."))
+import gpicsync
+from gpicsync import Matcher,GpicSync
+from test_track import sparseTrack
+
+PICTURES=[("a.jpg",["2006:11:05","15:10:00","800","600"]),
+("b.jpg",["0000:00:00","00:00:00","800","600"]), # camera clock never set
+("c.jpg",["nodate","nodate","nodate","nodate"])]
+
+class TestInvalidDates(unittest.TestCase):
+    def testMatch(self):
+        results=Matcher(sparseTrack(),timerange=300).match(PICTURES)
+        self.assertTrue(results[0].geocoded)
+        for result in results[1:]:
+            self.assertEqual(result.picTime,None)
+            self.assertFalse(result.geocoded)
+            self.assertEqual(result.asList()[0],
+            " : WARNING: DIDN'T GEOCODE, no Date/Time Original in this picture.")
+
+    def testPicturesTimes(self):
+        sync=GpicSync.__new__(GpicSync)
+        sync.matcher=Matcher(sparseTrack())
+        readPicturesInfo=gpicsync.readPicturesInfo
+        gpicsync.readPicturesInfo=lambda pictures:dict([(picture,{"dateTimeSize":picDateTimeSize})
+        for picture,picDateTimeSize in PICTURES])
+        try:
+            self.assertEqual(sync.picturesTimes([picture for picture,picDateTimeSize in PICTURES]),
+            [1162739400])
+        finally:
+            gpicsync.readPicturesInfo=readPicturesInfo
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+#!/usr/bin/python
+
+###############################################################################
+#
+# This script is released under the GPL v2 license
+#
+###############################################################################
+
+"""Tests of the gpx file reader (run: python -m unittest discover tests)"""
+
+import os,sys,shutil,tempfile,unittest
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),".."))
+from gpx import readGpx,readTcx
+from fit import readFit
+from test_fit import fitFile,records
+
+GPX_POINTS="".join(['<trkpt lat="48.%d" lon="7.%d"><ele>%d</ele>'
+'<time>2006-11-05T15:%02d:00Z</time></trkpt>\n' % (i,i,100+i,i) for i in range(5)])
+GPX="""<?xml version="1.0"?>
+<gpx version="1.1" creator="test" xmlns="http://www.topografix.com/GPX/1/1">
+<trk><trkseg>
+%s</trkseg></trk>
+</gpx>
+""" % GPX_POINTS
+
+class TestTruncatedFiles(unittest.TestCase):
+    def setUp(self):
+        self.directory=tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def writeFile(self,name,data):
+        fileName=os.path.join(self.directory,name)
+        f=open(fileName,"wb")
+        f.write(data)
+        f.close()
+        return fileName
+
+    def testCompleteGpx(self):
+        points=list(readGpx(self.writeFile("complete.gpx",GPX)))
+        self.assertEqual(len(points),5)
+        self.assertEqual(points[0],("trkpt","2006-11-05T15:00:00Z","48.0","7.0","100"))
+
+    def testTruncatedGpx(self):
+        # cut in the middle of the fourth point, like a logger switched off
+        data=GPX[:GPX.index("<trkpt",GPX.index("15:03:00"))-40]
+        points=list(readGpx(self.writeFile("truncated.gpx",data)))
+        self.assertEqual([point[1] for point in points],
+        ["2006-11-05T15:%02d:00Z" % i for i in range(3)])
+
+    def testTruncatedTcx(self):
+        data=("""<?xml version="1.0"?>
+<TrainingCenterDatabase xmlns="http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2">
+<Activities><Activity><Lap><Track>
+<Trackpoint><Time>2006-11-05T15:00:00Z</Time><Position><LatitudeDegrees>48.5</LatitudeDegrees>
+<LongitudeDegrees>7.2</LongitudeDegrees></Position><AltitudeMeters>150</AltitudeMeters></Trackpoint>
+<Trackpoint><Time>2006-11-05T15:01:00Z</Time><Position><LatitudeDegrees>48.6""")
+        points=list(readTcx(self.writeFile("truncated.tcx",data)))
+        self.assertEqual(len(points),1)
+        self.assertEqual(points[0][1:],(48.5,7.2,150.0))
+
+    def testTruncatedFit(self):
+        # a device losing power: the records before the end are kept
+        points=list(readFit(self.writeFile("truncated.fit",fitFile(records())[:-5])))
+        self.assertEqual([point[0] for point in points],[1162739000,1162739010])
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+#!/usr/bin/python
+
+###############################################################################
+#
+# This script is released under the GPL v2 license
+#
+###############################################################################
+
+"""Tests of the track and of the offset estimation (run: python -m unittest discover tests)"""
+
+import os,sys,shutil,tempfile,random,unittest
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),".."))
+import gpx
+from track import Track,parseIsoTime
+from gpicsync import GpicSync
+
+START=1162739000 # 2006-11-05 15:03:20 UTC
+
+def sparseTrack(points=120,interval=60):
+    """A straight track with a point every 'interval' seconds"""
+    track=Track()
+    for i in range(points):
+        track.append(START+i*interval,48.5+i*0.001,7.2+i*0.001,150.0)
+    return track
+
+def writeGpx(fileName,track):
+    f=open(fileName,"w")
+    f.write('<?xml version="1.0"?>\n<gpx version="1.1" creator="test"><trk><trkseg>\n')
+    for i in range(len(track)):
+        date,hour=track.dateTime(i)
+        f.write('<trkpt lat="%f" lon="%f"><time>%sT%sZ</time></trkpt>\n'
+        % (track.lats[i],track.lons[i],date,hour))
+    f.write('</trkseg></trk></gpx>\n')
+    f.close()
+
+class TestParseIsoTime(unittest.TestCase):
+    def testValidTimes(self):
+        self.assertEqual(parseIsoTime("2006-11-05T15:03:20Z"),START)
+        self.assertEqual(parseIsoTime("2006-11-05T15:03:20.750Z"),START)
+        self.assertEqual(parseIsoTime("2006-11-05T17:03:20+02:00"),START)
+        self.assertEqual(parseIsoTime("20061105T100320-0500"),START)
+
+    def testInvalidTimes(self):
+        for text in ["2006-11-05T24:00:00Z","2006-11-05T15:60:00Z","2006-11-05T15:03:60Z",
+        "2006-13-05T15:03:20Z","2006-02-30T15:03:20Z","2006-11-05T15:03:20+24:00",
+        "2006-11-05T15:03:20+02:60","2006-11-05 15:03"]:
+            self.assertRaises(ValueError,parseIsoTime,text)
+
+class TestEstimateOffset(unittest.TestCase):
+    def setUp(self):
+        self.directory=tempfile.mkdtemp()
+        self.cacheDir=gpx.CACHE_DIR
+        gpx.CACHE_DIR=os.path.join(self.directory,"cache")
+        random.seed(4)
+        # a camera with a correct clock taking pictures from the start to
+        # the end of the track
+        self.picTimes=sorted([START+random.randint(1,119*60-1) for i in range(38)]+[START,START+119*60])
+
+    def tearDown(self):
+        gpx.CACHE_DIR=self.cacheDir
+        shutil.rmtree(self.directory)
+
+    def testSparseTrack(self):
+        offset,count=sparseTrack().estimateOffset(self.picTimes,range(-600,601),300)
+        self.assertEqual((offset,count),(0,40))
+
+    def testSparseTrackGpicSync(self):
+        fileName=os.path.join(self.directory,"sparse.gpx")
+        writeGpx(fileName,sparseTrack())
+        sync=GpicSync([fileName],timerange=300)
+        self.assertEqual(sync.estimateOffset(self.picTimes),(0,40))
+
+    def testShiftedClock(self):
+        # a camera 20 minutes ahead
+        picTimes=[t+1200 for t in self.picTimes]
+        offset,count=sparseTrack().estimateOffset(picTimes,range(-3600,3601,60),60)
+        self.assertEqual((offset,count),(1200,40))
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,617 @@
+#!/usr/bin/python
+
+###############################################################################
+#
+# This script is released under the GPL v2 license
+#
+###############################################################################
+
+"""
+A compact representation of a gps track for gpicsync.
+
+A Track keeps its points in parallel typed arrays instead of one dictionary
+per point:
+        'times': UTC time of each point in seconds since the epoch
+        'lats': latitude in decimal degrees
+        'lons': longitude in decimal degrees
+        'eles': elevation in meters, NaN when the point has no elevation
+
+The old list of dictionaries returned by gpx.Gpx.extract() is still
+available through Track.dicts(), a view building the dictionaries on demand.
+
+Compressed gps files (.gz, .bz2 and .xz if the lzma module is available)
+are decompressed on the fly by openTrackFile.
+
+Tracks are kept sorted by time without duplicated times (see sortTrack and
+mergeTracks) so the neighbours of a point in the columns are its neighbours
+in time.
+
+The positions of the track at many times are computed at once by
+Track.locate, with NumPy if it is installed, in pure python otherwise.
+Track.estimateOffset uses the same backends to find the clock offset of
+a camera from the times of its pictures.
+
+Tracks can be saved to and loaded back from a small binary file (see
+saveTrack and loadTrack) so gps files don't have to be parsed again.
+"""
+
+import os,sys,re,time,datetime,calendar,struct,mmap,heapq,bisect,gzip,bz2,math
+from array import array
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma=None
+try:
+    import numpy
+except ImportError:
+    numpy=None
+
+NAN=float("nan")
+EARTH_RADIUS=6371000.0 # meters
+# distance given to an anchor picture out of the track at an offset (meters)
+UNREACHED=2*EARTH_RADIUS*math.pi
+
+# 64 bits integers for the times if this python has them ('q' only exists
+# from python 3.3), 'l' is also 64 bits on most unix builds.
+try:
+    array('q')
+    TIME_TYPECODE='q'
+except ValueError:
+    TIME_TYPECODE='l'
+
+def openCompressed(opener):
+    """Returns a function opening a compressed file for reading with opener"""
+    def openFile(fileName):
+        return opener(fileName,"rb")
+    return openFile
+
+# functions opening the compressed files by extension
+COMPRESSIONS={
+    ".gz":openCompressed(gzip.GzipFile),
+    ".bz2":openCompressed(bz2.BZ2File),
+}
+if lzma is not None:
+    COMPRESSIONS[".xz"]=openCompressed(lzma.LZMAFile)
+
+def trackExtension(fileName):
+    """
+    Returns the lower case extension of a gps file, without the compression
+    extension: 'log.GPX.gz' -> '.gpx'
+    """
+    name,extension=os.path.splitext(fileName)
+    if extension.lower() in COMPRESSIONS:
+        extension=os.path.splitext(name)[1]
+    return extension.lower()
+
+def openTrackFile(fileName):
+    """
+    Opens a gps file for reading in binary mode, the compressed files (see
+    COMPRESSIONS) are decompressed while they are read. Raises IOError for
+    the .xz files when the lzma module is missing.
+    """
+    extension=os.path.splitext(fileName)[1].lower()
+    if extension in COMPRESSIONS:
+        return COMPRESSIONS[extension](fileName)
+    if extension==".xz":
+        raise IOError("xz support needs the lzma module (or backports.lzma): %s" % fileName)
+    return open(fileName,"rb")
+
+# ISO 8601 date and time, fractions of seconds and the offset are optional
+ISO_TIME=re.compile(r"\s*(\d{4})-?(\d\d)-?(\d\d)[T ](\d\d):?(\d\d):?(\d\d)(?:[.,]\d*)?"
+r"\s*(?:(Z)|([+-])(\d\d)(?::?(\d\d))?)?\s*$")
+# epoch seconds of the days already seen by parseIsoTime
+isoDays={}
+
+def parseIsoTime(text):
+    """
+    Returns the UTC epoch seconds of an ISO 8601 time string like
+    '2006-11-05T15:21:27Z', '2006-11-05T15:21:27.250Z' or
+    '2006-11-05T17:21:27+02:00'. Fractions of seconds are dropped and times
+    without offset are taken as UTC. Raises ValueError for other strings.
+    """
+    match=ISO_TIME.match(text)
+    if match is None:
+        raise ValueError("Not an ISO 8601 time: %r" % text)
+    year,month,day,hour,minute,second,utc,sign,offsetHour,offsetMinute=match.groups()
+    if int(hour)>23 or int(minute)>59 or int(second)>59\
+    or (sign and (int(offsetHour)>23 or int(offsetMinute or 0)>59)):
+        raise ValueError("Not an ISO 8601 time: %r" % text)
+    key=year+month+day
+    try:
+        epoch=isoDays[key]
+    except KeyError:
+        if not (1<=int(month)<=12 and 1<=int(day)<=calendar.monthrange(int(year),int(month))[1]):
+            raise ValueError("Not an ISO 8601 time: %r" % text)
+        epoch=isoDays[key]=calendar.timegm((int(year),int(month),int(day),0,0,0))
+    epoch+=int(hour)*3600+int(minute)*60+int(second)
+    if sign:
+        offset=int(offsetHour)*3600
+        if offsetMinute: offset+=int(offsetMinute)*60
+        if sign=="+": epoch-=offset
+        else: epoch+=offset
+    return epoch
+
+def formatCoordinate(value):
+    """Returns a latitude/longitude float as a string like '48.5796761739'"""
+    return repr(value)
+
+def formatElevation(value):
+    """Returns an elevation float as a string, or "None" if it is NaN"""
+    if value!=value:
+        return "None"
+    return repr(value)
+
+class Track(object):
+    """
+    Parallel columns (times,lats,lons,eles) of the points of a gps track.
+    """
+    def __init__(self):
+        self.times=array(TIME_TYPECODE)
+        self.lats=array('d')
+        self.lons=array('d')
+        self.eles=array('d')
+
+    def __len__(self):
+        return len(self.times)
+
+    def __getstate__(self):
+        # pickle the columns as raw bytes rather than lists of numbers, tracks
+        # are sent between processes (see gpx.Gpx workers)
+        return [(column.typecode,column.tostring())
+        for column in (self.times,self.lats,self.lons,self.eles)]
+
+    def __setstate__(self,state):
+        columns=[]
+        for typecode,data in state:
+            column=array(typecode)
+            column.fromstring(data)
+            columns.append(column)
+        self.times,self.lats,self.lons,self.eles=columns
+
+    def append(self,time,lat,lon,ele=NAN):
+        """Add a point (epoch seconds, float degrees and meters or NaN)"""
+        self.times.append(time)
+        self.lats.append(lat)
+        self.lons.append(lon)
+        self.eles.append(ele)
+
+    def extend(self,other):
+        """Add all the points of another Track at the end of this one"""
+        self.times.extend(other.times)
+        self.lats.extend(other.lats)
+        self.lons.extend(other.lons)
+        self.eles.extend(other.eles)
+
+    def nearest(self,time):
+        """
+        Returns the index of the point of a sorted track closest to the epoch
+        seconds 'time' (the earliest one if two points are as close) found by
+        bisection, or None if the track is empty.
+        """
+        times=self.times
+        i=bisect.bisect_left(times,time)
+        if i==len(times):
+            if i==0: return None
+            return i-1
+        if i>0 and time-times[i-1]<=times[i]-time:
+            return i-1
+        return i
+
+    def locate(self,times,timerange,interpolation=False):
+        """
+        Returns the positions of a sorted, non empty, track at the epoch
+        seconds 'times' as a tuple (lats,lons,eles,deltas,found) of sequences
+        with an item per time:
+            'lats','lons','eles': the nearest point, or with interpolation
+            the position between the nearest point and its neighbour on the
+            other side of the time (the nearest point at the track ends)
+            'deltas': seconds between the time and the nearest point
+            'found': True if the delta is below timerange
+        The sequences are NumPy arrays if NumPy is installed, lists otherwise.
+        """
+        if numpy is not None:
+            return locateNumpy(self,times,timerange,interpolation)
+        return locatePython(self,times,timerange,interpolation)
+
+    def samplingInterval(self):
+        """
+        Returns the median number of seconds between two points of a sorted
+        track, 0 with less than two points.
+        """
+        if len(self.times)<2:
+            return 0
+        times=self.times
+        if numpy is not None:
+            intervals=numpy.diff(numpy.frombuffer(times,dtype=times.itemsize==8 and numpy.int64 or numpy.int32))
+            return int(numpy.sort(intervals)[len(intervals)//2])
+        intervals=sorted([times[i+1]-times[i] for i in xrange(len(times)-1)])
+        return intervals[len(intervals)//2]
+
+    def estimateOffset(self,times,offsets,timerange,anchors=None):
+        """
+        Returns the offset in seconds, among 'offsets', which fits best the
+        epoch seconds 'times' of pictures on a sorted, non empty, track, the
+        picture times being corrected as time-offset. The best offset puts
+        the most pictures within timerange of a trackpoint, then the fewest
+        in the gaps of the track: the time deltas shorter than the sampling
+        interval of the track are only the luck of the logger timing and
+        don't count. The smallest offset wins ties.
+        anchors: an optional list of (time,lat,lon) of pictures with a known
+        position, the offset putting them the nearest to these positions on
+        the track is chosen first.
+        Returns a tuple (offset,count), count being the number of pictures
+        within timerange of a trackpoint with this offset.
+        """
+        interval=self.samplingInterval()
+        if numpy is not None:
+            costs=offsetCostsNumpy(self,times,offsets,timerange,interval,anchors or [])
+        else:
+            costs=offsetCostsPython(self,times,offsets,timerange,interval,anchors or [])
+        # an unsynchronized camera is rare
+        best=min(xrange(len(offsets)),key=lambda k:(costs[k][0],-costs[k][2],costs[k][1],abs(offsets[k])))
+        return offsets[best],costs[best][2]
+
+    def slice(self,i,j):
+        """Returns a Track with the points i to j-1"""
+        track=Track()
+        track.times=self.times[i:j]
+        track.lats=self.lats[i:j]
+        track.lons=self.lons[i:j]
+        track.eles=self.eles[i:j]
+        return track
+
+    def window(self,start,end):
+        """
+        Returns the points of a sorted track between the epoch seconds start
+        and end, plus the closest point before and after them (see buildTrack).
+        """
+        i,j=windowIndexes(self.times,len(self.times),start,end)
+        if i==0 and j==len(self.times):
+            return self
+        return self.slice(i,j)
+
+    def dateTime(self,i):
+        """Returns the UTC date and time of point i like ('2006-11-05','15:21:27')"""
+        t=time.gmtime(self.times[i])
+        return time.strftime("%Y-%m-%d",t),time.strftime("%H:%M:%S",t)
+
+    def point(self,i):
+        """Returns point i as a dictionary like the ones of gpx.Gpx.extract()"""
+        date,hour=self.dateTime(i)
+        return {
+        'date':date,
+        'time':hour,
+        'lat':formatCoordinate(self.lats[i]),
+        'lon':formatCoordinate(self.lons[i]),
+        'ele':formatElevation(self.eles[i]),
+        'datetime':datetime.datetime.utcfromtimestamp(self.times[i]),
+        }
+
+    def dicts(self):
+        """Returns a lazy sequence of dictionaries (see Track.point)"""
+        return TrackDictView(self)
+
+class TrackDictView(object):
+    """
+    Read-only sequence giving the points of a Track as dictionaries.
+    Kept for backwards compatibility, the dictionaries are built on access.
+    """
+    def __init__(self,track):
+        self.track=track
+
+    def __len__(self):
+        return len(self.track)
+
+    def __getitem__(self,i):
+        if isinstance(i,slice):
+            return [self.track.point(n) for n in xrange(*i.indices(len(self.track)))]
+        if i<0: i+=len(self.track)
+        if not 0<=i<len(self.track): raise IndexError("track index out of range")
+        return self.track.point(i)
+
+    def __iter__(self):
+        for i in xrange(len(self.track)):
+            yield self.track.point(i)
+
+def locatePython(track,times,timerange,interpolation):
+    """Track.locate in pure python: one forward walk over the track"""
+    trackTimes,trackLats,trackLons,trackEles=track.times,track.lats,track.lons,track.eles
+    count=len(trackTimes)
+    lats=[NAN]*len(times)
+    lons=[NAN]*len(times)
+    eles=[NAN]*len(times)
+    deltas=[0]*len(times)
+    i=0 # first point not before the current time
+    for k in sorted(xrange(len(times)),key=times.__getitem__):
+        t=times[k]
+        while i<count and trackTimes[i]<t:
+            i+=1
+        # the nearest point, the earliest one if two are as close
+        if i==count: N=i-1
+        elif i>0 and t-trackTimes[i-1]<=trackTimes[i]-t: N=i-1
+        else: N=i
+        lat,lon,ele=trackLats[N],trackLons[N],trackEles[N]
+        if interpolation and N+1<count:
+            if (t-trackTimes[N])*(t-trackTimes[N+1])<=0: M=N+1
+            else: M=N-1
+            if M>=0:
+                ratio=abs(float(t-trackTimes[N]))/(abs(t-trackTimes[N])+abs(t-trackTimes[M]))
+                lat=lat+ratio*(trackLats[M]-lat)
+                lon=lon+ratio*(trackLons[M]-lon)
+                interpolated=ele+ratio*(trackEles[M]-ele)
+                if interpolated==interpolated: ele=interpolated
+        lats[k],lons[k],eles[k]=lat,lon,ele
+        deltas[k]=abs(t-trackTimes[N])
+    found=[delta<timerange for delta in deltas]
+    return lats,lons,eles,deltas,found
+
+def locateNumpy(track,times,timerange,interpolation):
+    """Track.locate with NumPy: searchsorted and array arithmetic"""
+    trackTimes=numpy.frombuffer(track.times,dtype=track.times.itemsize==8 and numpy.int64 or numpy.int32)
+    trackLats=numpy.frombuffer(track.lats,dtype=numpy.float64)
+    trackLons=numpy.frombuffer(track.lons,dtype=numpy.float64)
+    trackEles=numpy.frombuffer(track.eles,dtype=numpy.float64)
+    count=len(trackTimes)
+    t=numpy.asarray(times,dtype=numpy.int64)
+    i=numpy.searchsorted(trackTimes,t,side="left")
+    before=numpy.clip(i-1,0,count-1)
+    after=numpy.clip(i,0,count-1)
+    # the nearest point, the earliest one if two are as close
+    N=numpy.where(t-trackTimes[before]<=trackTimes[after]-t,before,after)
+    deltaN=numpy.abs(t-trackTimes[N])
+    lats,lons,eles=trackLats[N],trackLons[N],trackEles[N]
+    if interpolation:
+        nextTimes=trackTimes[numpy.minimum(N+1,count-1)]
+        M=numpy.where((t-trackTimes[N])*(t-nextTimes)<=0,N+1,N-1)
+        valid=(N+1<count)&(M>=0)
+        M=numpy.clip(M,0,count-1)
+        total=deltaN+numpy.abs(t-trackTimes[M])
+        ratio=numpy.where(valid,deltaN/numpy.maximum(total,1).astype(numpy.float64),0.0)
+        lats=lats+ratio*(trackLats[M]-lats)
+        lons=lons+ratio*(trackLons[M]-lons)
+        interpolated=eles+ratio*(trackEles[M]-eles)
+        eles=numpy.where(numpy.isnan(interpolated),eles,interpolated)
+    return lats,lons,eles,deltaN,deltaN<timerange
+
+def groundDistance(lat1,lon1,lat2,lon2,math=math):
+    """
+    Returns the distance in meters between two close positions in decimal
+    degrees (equirectangular approximation). Pass math=numpy for arrays.
+    """
+    x=math.radians(lon2-lon1)*math.cos(math.radians((lat1+lat2)/2.))
+    y=math.radians(lat2-lat1)
+    return EARTH_RADIUS*math.sqrt(x*x+y*y)
+
+def offsetCostsPython(track,times,offsets,timerange,interval,anchors):
+    """
+    Track.estimateOffset in pure python, returns a list of tuples
+    (anchorsCost,gapsCost,count) per offset: the sum of the anchors
+    distances to their position (meters), the sum of the time deltas to
+    the nearest trackpoint beyond the sampling interval of the track (at
+    most timerange) and the number of pictures within timerange.
+    """
+    trackTimes=track.times
+    costs=[]
+    for offset in offsets:
+        gapsCost=0
+        count=0
+        for t in times:
+            delta=abs(t-offset-trackTimes[track.nearest(t-offset)])
+            if delta<timerange:
+                gapsCost+=max(delta-interval,0)
+                count+=1
+            else:
+                gapsCost+=timerange
+        anchorsCost=0
+        if anchors:
+            lats,lons,eles,deltas,found=locatePython(track,
+            [t-offset for t,lat,lon in anchors],timerange,True)
+            for i,(t,lat,lon) in enumerate(anchors):
+                if found[i]: anchorsCost+=groundDistance(lat,lon,lats[i],lons[i])
+                else: anchorsCost+=UNREACHED
+        costs.append((anchorsCost,gapsCost,count))
+    return costs
+
+def offsetCostsNumpy(track,times,offsets,timerange,interval,anchors):
+    """Track.estimateOffset with NumPy, see offsetCostsPython"""
+    trackTimes=numpy.frombuffer(track.times,dtype=track.times.itemsize==8 and numpy.int64 or numpy.int32)
+    count=len(trackTimes)
+    t=numpy.asarray(times,dtype=numpy.int64)
+    o=numpy.asarray(offsets,dtype=numpy.int64)
+    gapsCosts=[]
+    counts=[]
+    # all the offsets at once, by blocks of about a million pictures times
+    rows=max(1,1000000//max(len(t),1))
+    for start in xrange(0,len(o),rows):
+        shifted=t[numpy.newaxis,:]-o[start:start+rows,numpy.newaxis]
+        i=numpy.searchsorted(trackTimes,shifted,side="left")
+        before=trackTimes[numpy.clip(i-1,0,count-1)]
+        after=trackTimes[numpy.clip(i,0,count-1)]
+        deltas=numpy.minimum(numpy.abs(shifted-before),numpy.abs(after-shifted))
+        gaps=numpy.where(deltas<timerange,numpy.maximum(deltas-interval,0),timerange)
+        gapsCosts.append(gaps.sum(axis=1))
+        counts.append((deltas<timerange).sum(axis=1))
+    gapsCosts=numpy.concatenate(gapsCosts)
+    counts=numpy.concatenate(counts)
+    anchorsCosts=numpy.zeros(len(o))
+    if anchors:
+        a=numpy.asarray(anchors,dtype=numpy.float64)
+        shifted=a[numpy.newaxis,:,0].astype(numpy.int64)-o[:,numpy.newaxis]
+        lats,lons,eles,deltas,found=locateNumpy(track,shifted.ravel(),timerange,True)
+        distances=groundDistance(numpy.tile(a[:,1],len(o)),numpy.tile(a[:,2],len(o)),lats,lons,math=numpy)
+        distances=numpy.where(found,distances,UNREACHED)
+        anchorsCosts=distances.reshape(len(o),len(anchors)).sum(axis=1)
+    return [(float(anchorsCosts[k]),int(gapsCosts[k]),int(counts[k])) for k in xrange(len(o))]
+
+def windowIndexes(times,count,start,end):
+    """
+    Returns the indexes (i,j) of the slice of the sorted sequence 'times'
+    with the times between start and end plus one more time on each side.
+    """
+    i=bisect.bisect_left(times,start,0,count)
+    j=bisect.bisect_right(times,end,i,count)
+    return max(i-1,0),min(j+1,count)
+
+def buildTrack(points,window=None):
+    """
+    Returns a sorted Track (see sortTrack) with the (time,lat,lon,ele) points.
+    With a window (start,end) in epoch seconds only the points between start
+    and end are kept, plus the closest point before and after them so the
+    nearest point and the interpolation are the same as with all the points.
+    """
+    track=Track()
+    if window is None:
+        for point in points:
+            track.append(*point)
+        return sortTrack(track)
+    start,end=window
+    before=None
+    after=None
+    for point in points:
+        time=point[0]
+        if time<start:
+            if before is None or time>before[0]: before=point
+        elif time>end:
+            if after is None or time<after[0]: after=point
+        else:
+            track.append(*point)
+    for point in (before,after):
+        if point is not None:
+            track.append(*point)
+    return sortTrack(track)
+
+def sortTrack(track):
+    """
+    Returns the track sorted by time, keeping only the first point of the
+    points having the same time. The track itself is returned if it is
+    already sorted without duplicates.
+    """
+    times=track.times
+    for i in xrange(1,len(times)):
+        if times[i]<=times[i-1]: break
+    else:
+        return track
+    order=sorted(xrange(len(times)),key=times.__getitem__)
+    result=Track()
+    last=None
+    for i in order:
+        if times[i]!=last:
+            result.append(times[i],track.lats[i],track.lons[i],track.eles[i])
+            last=times[i]
+    return result
+
+def mergeTracks(tracks):
+    """
+    Merge tracks sorted by time (see sortTrack) into one sorted track.
+    When several points have the same time (overlapping exports of the same
+    logger) only the first one, in the order of 'tracks', is kept.
+    """
+    tracks=[track for track in tracks if len(track)>0]
+    if len(tracks)==0:
+        return Track()
+    if len(tracks)==1:
+        return tracks[0]
+    def points(k,track):
+        for i in xrange(len(track)):
+            yield track.times[i],k,i
+    result=Track()
+    last=None
+    for time,k,i in heapq.merge(*[points(k,track) for k,track in enumerate(tracks)]):
+        if time!=last:
+            track=tracks[k]
+            result.append(time,track.lats[i],track.lons[i],track.eles[i])
+            last=time
+    return result
+
+# Binary track file: a header, the key of the source file, then the four
+# columns stored as little endian 64 bits values.
+CACHE_MAGIC="GPSTRACK"
+CACHE_VERSION=3
+CACHE_HEADER=struct.Struct("<8sIIQ")
+
+def saveTrack(track,fileName,key):
+    """
+    Write the track in the binary file 'fileName'.
+    'key' is a string identifying the source of the track, loadTrack()
+    only returns the track if it is given the same key.
+    The file is written next to its final name then renamed into place.
+    """
+    tmpName=fileName+".tmp"
+    f=open(tmpName,"wb")
+    try:
+        f.write(CACHE_HEADER.pack(CACHE_MAGIC,CACHE_VERSION,len(key),len(track)))
+        f.write(key)
+        for column in (track.times,track.lats,track.lons,track.eles):
+            if column.itemsize!=8:
+                f.write(struct.pack("<%dq" % len(column),*column))
+                continue
+            if sys.byteorder!="little":
+                column=array(column.typecode,column)
+                column.byteswap()
+            column.tofile(f)
+    finally:
+        f.close()
+    if os.path.exists(fileName): os.remove(fileName)
+    os.rename(tmpName,fileName)
+
+class MappedTimes(object):
+    """The times column of a track file as a sequence, for bisect"""
+    def __init__(self,data,offset):
+        self.data=data
+        self.offset=offset
+
+    def __getitem__(self,i):
+        return struct.unpack_from("<q",self.data,self.offset+8*i)[0]
+
+def loadTrack(fileName,key,window=None):
+    """
+    Read a track written by saveTrack() through a memory map.
+    Returns None if the file doesn't exist, is damaged or was saved with
+    another key.
+    With a window (start,end) in epoch seconds, only the points of the
+    window (see Track.window) are read from the file.
+    """
+    try:
+        f=open(fileName,"rb")
+    except IOError:
+        return None
+    try:
+        try:
+            data=mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+        except (mmap.error,ValueError):
+            return None
+        try:
+            if len(data)<CACHE_HEADER.size:
+                return None
+            magic,version,keyLength,count=CACHE_HEADER.unpack(data[:CACHE_HEADER.size])
+            offset=CACHE_HEADER.size
+            if magic!=CACHE_MAGIC or version!=CACHE_VERSION\
+            or data[offset:offset+keyLength]!=key:
+                return None
+            offset+=keyLength
+            if len(data)!=offset+4*8*count:
+                return None
+            i,j=0,count
+            if window is not None:
+                i,j=windowIndexes(MappedTimes(data,offset),count,window[0],window[1])
+            columns=[]
+            for typecode in (TIME_TYPECODE,'d','d','d'):
+                column=array(typecode)
+                chunk=data[offset+8*i:offset+8*j]
+                if column.itemsize==8:
+                    column.fromstring(chunk)
+                    if sys.byteorder!="little": column.byteswap()
+                else:
+                    column.extend(struct.unpack("<%dq" % (j-i),chunk))
+                columns.append(column)
+                offset+=8*count
+        finally:
+            data.close()
+    finally:
+        f.close()
+    track=Track()
+    track.times,track.lats,track.lons,track.eles=columns
+    return track